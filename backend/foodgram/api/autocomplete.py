@@ -0,0 +1,67 @@
+from bisect import bisect_left
+from threading import Lock
+
+from recipes.models import Ingredient
+from recipes.signals import get_catalog_version
+
+
+def normalize(value):
+    return ' '.join(value.lower().replace('ё', 'е').split())
+
+
+class IngredientIndex:
+    """
+    Отсортированный по названиям индекс ингредиентов в памяти процесса.
+
+    Строится при первом запросе и перестраивается, когда меняется версия
+    справочника ингредиентов. Сначала возвращает ингредиенты, название
+    которых начинается с запроса, затем те, что содержат его внутри.
+
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.entries = ((), ())
+
+    def build(self):
+        ingredients = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda ingredient: (
+                normalize(ingredient['name']), ingredient['id'])
+        )
+        names = tuple(
+            normalize(ingredient['name']) for ingredient in ingredients)
+        return names, tuple(ingredients)
+
+    def refresh(self, version=None):
+        if version is None:
+            version = get_catalog_version(Ingredient)
+        if version == self.version:
+            return
+        with self.lock:
+            if version != self.version:
+                self.entries = self.build()
+                self.version = version
+
+    def search(self, query, limit, version=None):
+        self.refresh(version)
+        names, ingredients = self.entries
+        query = normalize(query)
+        position = bisect_left(names, query)
+        matches = []
+        while (position < len(names) and len(matches) < limit
+               and names[position].startswith(query)):
+            matches.append(ingredients[position])
+            position += 1
+        if len(matches) == limit:
+            return matches
+        for name, ingredient in zip(names, ingredients):
+            if query in name and not name.startswith(query):
+                matches.append(ingredient)
+                if len(matches) == limit:
+                    break
+        return matches
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,100 @@
+import base64
+import binascii
+import uuid
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+from foodgram.settings import (BASE64_DECODE_CHUNK_SIZE,
+                               RECIPE_IMAGE_RENDITIONS)
+from recipes.images import rendition_name
+
+
+class ImageRenditionsField(serializers.Field):
+    """
+    Ссылки на уменьшенные копии изображения рецепта. Пока копии
+    не готовы, все ссылки ведут на оригинал.
+
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        request = self.context.get('request')
+        renditions = {}
+        for rendition in RECIPE_IMAGE_RENDITIONS:
+            name = recipe.image.name
+            if recipe.image_renditions:
+                name = rendition_name(name, rendition)
+            url = default_storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            renditions[rendition] = url
+        return renditions
+
+
+class RecipeImageField(Base64ImageField):
+    """
+    Изображение рецепта: файл из multipart/form-data или строка base64.
+    Base64 декодируется по частям во временный файл на диске, чтобы
+    не держать в памяти ещё одну копию изображения.
+
+    """
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if isinstance(data, UploadedFile):
+            return serializers.ImageField.to_internal_value(self, data)
+        if not isinstance(data, str):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        file = self.decode_to_file(data)
+        try:
+            with Image.open(file) as image:
+                extension = image.format.lower()
+        except (OSError, AttributeError):
+            file.close()
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        extension = 'jpg' if extension == 'jpeg' else extension
+        if extension not in self.ALLOWED_TYPES:
+            file.close()
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        file.name = f'{uuid.uuid4()}.{extension}'
+        file.seek(0)
+        return serializers.ImageField.to_internal_value(self, file)
+
+    def decode_to_file(self, data):
+        content_type = None
+        start = data.find(';base64,')
+        if start != -1:
+            if self.trust_provided_content_type:
+                content_type = data[:start].replace('data:', '')
+            start += len(';base64,')
+        file = TemporaryUploadedFile(
+            'upload', content_type, size=0, charset=None)
+        remainder = ''
+        try:
+            for position in range(
+                    max(start, 0), len(data), BASE64_DECODE_CHUNK_SIZE):
+                chunk = remainder + ''.join(
+                    data[position:position + BASE64_DECODE_CHUNK_SIZE].split()
+                )
+                usable = len(chunk) - len(chunk) % 4
+                file.write(base64.b64decode(chunk[:usable], validate=True))
+                remainder = chunk[usable:]
+            if remainder:
+                raise binascii.Error('Incorrect padding')
+        except (binascii.Error, ValueError):
+            file.close()
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        file.size = file.tell()
+        file.seek(0)
+        return file
@@ -1,30 +1,81 @@
+from django import forms
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When
 from django_filters import rest_framework as filter
 from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe
-from users.models import User
+from foodgram.settings import RECIPE_SEARCH_CONFIG
+from recipes.models import Cart, Favorite, Recipe, TagRecipe
+
+
+class TagSlugsField(forms.MultipleChoiceField):
+    """
+    Список slug тегов без проверки по справочнику: неизвестный slug
+    не ошибка, по нему просто не найдётся рецептов в filter_tags.
+
+    """
+
+    def valid_value(self, value):
+        return True
+
+
+class TagSlugsFilter(filter.MultipleChoiceFilter):
+    field_class = TagSlugsField
 
 
 class RecipeFilter(filter.FilterSet):
     is_favorited = filter.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filter.BooleanFilter(
         method='filter_is_in_shopping_cart')
-    author = filter.ModelChoiceFilter(queryset=User.objects.all())
-    tags = filter.AllValuesMultipleFilter(field_name='tags__slug')
+    author = filter.NumberFilter(field_name='author_id')
+    tags = TagSlugsFilter(method='filter_tags')
+    search = filter.CharFilter(method='filter_search')
 
     def filter_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(Exists(Favorite.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk'))))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(carts__user=self.request.user)
+            return queryset.filter(Exists(Cart.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk'))))
         return queryset
 
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(TagRecipe.objects.filter(
+            recipe=OuterRef('pk'), tag__slug__in=value)))
+
+    def filter_search(self, queryset, name, value):
+        """
+        В PostgreSQL — полнотекстовый поиск по search_vector с сортировкой
+        по релевантности (название весит больше текста), в остальных
+        базах — поиск подстроки, сначала совпадения в названии.
+        Курсорная пагинация всё равно упорядочивает выдачу по id.
+
+        """
+        if connections[queryset.db].vendor == 'postgresql':
+            query = SearchQuery(
+                value, config=RECIPE_SEARCH_CONFIG, search_type='websearch')
+            return queryset.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F('search_vector'), query)
+            ).order_by('-search_rank', '-id')
+        return queryset.filter(
+            Q(name__icontains=value) | Q(text__icontains=value)
+        ).annotate(
+            search_rank=Case(
+                When(name__icontains=value, then=Value(1)),
+                default=Value(0),
+            )
+        ).order_by('-search_rank', '-id')
+
     class Meta:
         model = Recipe
-        fields = ('author', 'tags',)
+        fields = ('author', 'tags', 'search',)
 
 
 class IngredientSearchFilter(SearchFilter):
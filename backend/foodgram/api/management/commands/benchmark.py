@@ -0,0 +1,123 @@
+import logging
+from statistics import median
+from time import perf_counter
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import User
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[round(fraction * (len(values) - 1))]
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет основные эндпоинты API внутри процесса и выводит '
+            'p50/p95 времени ответа и число SQL-запросов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Количество запросов к каждому эндпоинту',
+        )
+        parser.add_argument(
+            '--user',
+            help='Email пользователя, от имени которого выполнять запросы; '
+                 'по умолчанию берётся пользователь с самым большим '
+                 'списком покупок',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должен быть больше нуля')
+        logging.getLogger('foodgram.requests').setLevel(logging.WARNING)
+        user = self.get_user(options['user'])
+        client = APIClient()
+        client.force_authenticate(user)
+        self.stdout.write(
+            f'{"Эндпоинт":<45}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"SQL":>8}{"SQL max":>9}'
+        )
+        for name, url in self.get_endpoints(user):
+            self.measure(client, name, url, options)
+
+    def get_user(self, email):
+        users = User.objects.all()
+        if email:
+            users = users.filter(email=email)
+        user = users.annotate(
+            carts_count=Count('carts')
+        ).order_by('-carts_count', 'id').first()
+        if user is None:
+            raise CommandError(
+                'Нет пользователей: сначала выполните generate_data')
+        return user
+
+    def get_endpoints(self, user):
+        recipe = Recipe.objects.order_by('-id').first()
+        if recipe is None:
+            raise CommandError(
+                'Нет рецептов: сначала выполните generate_data')
+        tags = '&'.join(
+            f'tags={slug}'
+            for slug in Tag.objects.values_list('slug', flat=True)[:2]
+        )
+        ingredient = Ingredient.objects.order_by('id').first()
+        prefix = ingredient.name[:2] if ingredient else 'а'
+        ingredient_ids = ','.join(str(ingredient_id) for ingredient_id in (
+            IngredientRecipe.objects.filter(recipe=recipe).values_list(
+                'ingredient_id', flat=True)))
+        return (
+            ('recipes list', '/api/recipes/'),
+            ('recipes list ?limit=100', '/api/recipes/?limit=100'),
+            ('recipes list ?tags', f'/api/recipes/?{tags}'),
+            ('recipes list ?author', f'/api/recipes/?author={user.id}'),
+            ('recipes list ?search',
+             '/api/recipes/?' + urlencode({'search': recipe.name.split()[0]})),
+            ('recipes list ?is_favorited', '/api/recipes/?is_favorited=1'),
+            ('recipes list ?is_in_shopping_cart',
+             '/api/recipes/?is_in_shopping_cart=1'),
+            ('recipe detail', f'/api/recipes/{recipe.id}/'),
+            ('recipes by_ingredients',
+             f'/api/recipes/by_ingredients/?ingredients={ingredient_ids}'),
+            ('subscriptions', '/api/users/subscriptions/?recipes_limit=3'),
+            ('ingredients search', f'/api/ingredients/?name={prefix}'),
+            ('download_shopping_cart pdf',
+             '/api/recipes/download_shopping_cart/'),
+            ('download_shopping_cart csv',
+             '/api/recipes/download_shopping_cart/?format=csv'),
+        )
+
+    def measure(self, client, name, url, options):
+        timings, queries = [], []
+        for _ in range(options['requests']):
+            if options['cold']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                started = perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                timings.append((perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{url} вернул статус {response.status_code}')
+            queries.append(len(context))
+        self.stdout.write(
+            f'{name:<45}{percentile(timings, 0.5):>10.1f}'
+            f'{percentile(timings, 0.95):>10.1f}'
+            f'{median(queries):>8.0f}{max(queries):>9}'
+        )
@@ -0,0 +1,135 @@
+import re
+from itertools import combinations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.views import RecipeViewSet
+from recipes.models import IngredientRecipe, Recipe, Tag
+from users.models import User
+from users.views import CustomUserViewSet
+
+WARNINGS = {
+    'postgresql': (
+        (re.compile(r'Seq Scan on (\w+)'), 'последовательное чтение {}'),
+        (re.compile(r'Sort Key: (.+)'), 'сортировка по {}'),
+    ),
+    'sqlite': (
+        (re.compile(r'SCAN (\w+)\b(?! USING)'), 'последовательное чтение {}'),
+        (re.compile(r'USE TEMP B-TREE FOR (.+)'), 'сортировка для {}'),
+    ),
+}
+
+
+def get_search_term():
+    """Первое слово названия последнего рецепта для проверки поиска."""
+    name = Recipe.objects.order_by('-id').values_list(
+        'name', flat=True).first()
+    return name.split()[0] if name else 'рецепт'
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для основных запросов API и отмечает '
+            'последовательные чтения таблиц и сортировки. Запускайте на '
+            'базе реалистичного размера (см. generate_data): на маленьких '
+            'таблицах планировщик всегда выбирает последовательное чтение.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help='Email пользователя, от имени которого '
+                           'строятся запросы',
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Выполнять запросы (EXPLAIN ANALYZE, только PostgreSQL)',
+        )
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы целиком',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(email=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Пользователь не найден')
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options['analyze'] = True
+        flagged = 0
+        for name, queryset in self.get_querysets(user):
+            plan = queryset.explain(**explain_options)
+            warnings = self.get_warnings(plan)
+            flagged += bool(warnings)
+            style = self.style.WARNING if warnings else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name}: {"; ".join(warnings) or "ok"}'))
+            if options['verbose_plans']:
+                self.stdout.write(plan)
+        self.stdout.write(f'Запросов с замечаниями: {flagged}')
+
+    def get_warnings(self, plan):
+        warnings = []
+        for pattern, message in WARNINGS.get(connection.vendor, ()):
+            for match in pattern.finditer(plan):
+                warning = message.format(match.group(1).strip())
+                if warning not in warnings:
+                    warnings.append(warning)
+        return warnings
+
+    def get_recipe_queryset(self, user, params):
+        view = RecipeViewSet(
+            action='list',
+            format_kwarg=None,
+            request=Request(APIRequestFactory().get('/', params)),
+        )
+        view.request.user = user
+        queryset = view.filter_queryset(view.get_queryset())
+        return queryset[:view.paginator.page_size]
+
+    def get_querysets(self, user):
+        filters = {
+            'tags': list(Tag.objects.values_list('slug', flat=True)[:2]),
+            'author': user.id,
+            'is_favorited': 1,
+            'is_in_shopping_cart': 1,
+            'search': get_search_term(),
+        }
+        for size in range(len(filters) + 1):
+            for names in combinations(filters, size):
+                params = {name: filters[name] for name in names}
+                yield (
+                    f'recipes list [{", ".join(names) or "без фильтров"}]',
+                    self.get_recipe_queryset(user, params),
+                )
+        recipe_ids = list(
+            self.get_recipe_queryset(user, {}).values_list('id', flat=True))
+        ingredient_ids = set(IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids[:1]
+        ).values_list('ingredient_id', flat=True))
+        yield (
+            'recipes by_ingredients',
+            RecipeViewSet.get_coverage_queryset(
+                Recipe.objects.all(), ingredient_ids or {0})[:6],
+        )
+        yield (
+            'recipe ingredients prefetch',
+            IngredientRecipe.objects.select_related(
+                'ingredient').filter(recipe_id__in=recipe_ids),
+        )
+        subscriptions = CustomUserViewSet.get_subscriptions(user)
+        yield 'subscriptions', subscriptions[:6]
+        authors = list(subscriptions[:6])
+        yield (
+            'subscriptions recipes_limit prefetch',
+            CustomUserViewSet.get_recipes_prefetch(
+                authors, 3).queryset.filter(author__in=authors),
+        )
+        yield (
+            'shopping cart aggregation',
+            RecipeViewSet.get_shopping_cart_ingredients(user),
+        )
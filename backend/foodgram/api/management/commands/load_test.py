@@ -0,0 +1,134 @@
+import asyncio
+from time import perf_counter
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import CommandError
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.benchmark import Command as BenchmarkCommand
+from api.management.commands.benchmark import percentile
+
+
+class Command(BenchmarkCommand):
+    help = ('Нагружает запущенный сервер параллельными HTTP-запросами к '
+            'основным эндпоинтам, в том числе при медленных клиентах. '
+            'Запустите его против SERVER_MODE=wsgi и SERVER_MODE=asgi, '
+            'чтобы сравнить режимы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Количество запросов к каждому эндпоинту',
+        )
+        parser.add_argument(
+            '--user',
+            help='Email пользователя, от имени которого выполнять запросы',
+        )
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000',
+            help='Адрес запущенного сервера',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=20,
+            help='Количество одновременных запросов',
+        )
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Сколько соединений держат медленные клиенты, которые '
+                 'отправляют запрос и читают ответ по частям',
+        )
+        parser.add_argument(
+            '--slow-delay', type=float, default=0.5,
+            help='Пауза медленного клиента между частями, с',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError(
+                '--requests и --concurrency должны быть больше нуля')
+        url = urlsplit(options['url'])
+        self.host, self.port = url.hostname, url.port or 80
+        user = self.get_user(options['user'])
+        token, _ = Token.objects.get_or_create(user=user)
+        self.headers = (
+            f'Host: {url.netloc}\r\n'
+            f'Authorization: Token {token.key}\r\n'
+            f'Connection: close\r\n'
+        )
+        self.stdout.write(
+            f'{"Эндпоинт":<45}{"RPS":>8}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"Ошибки":>8}'
+        )
+        for name, path in self.get_endpoints(user):
+            asyncio.run(self.measure(name, path, options))
+
+    async def fetch(self, path, delay=0):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            request = (
+                f'GET {quote(path, safe="/?&=")} HTTP/1.1\r\n'
+                f'{self.headers}\r\n'
+            ).encode()
+            if delay:
+                for line in request.splitlines(keepends=True):
+                    writer.write(line)
+                    await writer.drain()
+                    await asyncio.sleep(delay)
+            else:
+                writer.write(request)
+                await writer.drain()
+            status_line = await reader.readline()
+            while await reader.read(1024 if delay else 64 * 1024):
+                if delay:
+                    await asyncio.sleep(delay)
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+
+    async def slow_client(self, path, delay, stop):
+        while not stop.is_set():
+            try:
+                await self.fetch(path, delay)
+            except (OSError, ValueError, IndexError):
+                await asyncio.sleep(delay)
+
+    async def measure(self, name, path, options):
+        stop = asyncio.Event()
+        slow_clients = [
+            asyncio.create_task(
+                self.slow_client(path, options['slow_delay'], stop))
+            for _ in range(options['slow_clients'])
+        ]
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        timings, errors = [], 0
+
+        async def timed_fetch():
+            nonlocal errors
+            async with semaphore:
+                started = perf_counter()
+                try:
+                    status = await self.fetch(path)
+                except (OSError, ValueError, IndexError):
+                    status = None
+                if status == 200:
+                    timings.append((perf_counter() - started) * 1000)
+                else:
+                    errors += 1
+
+        started = perf_counter()
+        await asyncio.gather(
+            *(timed_fetch() for _ in range(options['requests'])))
+        elapsed = perf_counter() - started
+        stop.set()
+        for task in slow_clients:
+            task.cancel()
+        await asyncio.gather(*slow_clients, return_exceptions=True)
+        if not timings:
+            self.stdout.write(f'{name:<45}{"—":>8}{"—":>10}{"—":>10}'
+                              f'{errors:>8}')
+            return
+        self.stdout.write(
+            f'{name:<45}{len(timings) / elapsed:>8.1f}'
+            f'{percentile(timings, 0.5):>10.1f}'
+            f'{percentile(timings, 0.95):>10.1f}{errors:>8}'
+        )
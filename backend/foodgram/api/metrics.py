@@ -0,0 +1,189 @@
+import atexit
+import json
+import os
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock, Thread
+from time import perf_counter, sleep
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from foodgram.settings import (METRICS_DIR, METRICS_DUMP_INTERVAL,
+                               METRICS_DURATION_BUCKETS, METRICS_QUERY_BUCKETS)
+
+HISTOGRAMS = (
+    ('duration', 'foodgram_request_duration_seconds',
+     'Время обработки запроса, с', METRICS_DURATION_BUCKETS),
+    ('queries', 'foodgram_request_queries',
+     'Количество SQL-запросов за запрос', METRICS_QUERY_BUCKETS),
+    ('db_duration', 'foodgram_request_db_duration_seconds',
+     'Время SQL-запросов за запрос, с', METRICS_DURATION_BUCKETS),
+)
+
+current_request = ContextVar('current_request', default=None)
+
+
+class RequestStats:
+    """Счётчики SQL-запросов одного HTTP-запроса."""
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.queries = 0
+        self.db_duration = 0.0
+        self.started = perf_counter()
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обёртка выполнения SQL (connection.execute_wrapper): учитывает запрос
+    в статистике текущего HTTP-запроса, если он есть.
+
+    """
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_duration += perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Подключает record_query к каждому новому соединению с базой."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Metrics:
+    """
+    Гистограммы времени ответа, числа SQL-запросов и времени в базе
+    по представлению, методу и статусу ответа. Каждый воркер копит их
+    в памяти и раз в METRICS_DUMP_INTERVAL секунд сбрасывает в свой
+    файл в METRICS_DIR, откуда /metrics собирает данные всех воркеров.
+
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory) if directory else None
+        self.series = {}
+        self.lock = Lock()
+        self.flusher = None
+
+    def observe(self, labels, **values):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {
+                    name: {'buckets': [0] * (len(buckets) + 1), 'sum': 0}
+                    for name, _, _, buckets in HISTOGRAMS
+                }
+            for name, _, _, buckets in HISTOGRAMS:
+                histogram = series[name]
+                histogram['buckets'][bisect_left(buckets, values[name])] += 1
+                histogram['sum'] += values[name]
+            if self.directory is not None and self.flusher is None:
+                self.flusher = Thread(target=self.flush, daemon=True)
+                self.flusher.start()
+                atexit.register(self.dump)
+
+    def flush(self):
+        """Сбрасывает данные воркера в файл раз в METRICS_DUMP_INTERVAL."""
+        while True:
+            sleep(METRICS_DUMP_INTERVAL)
+            self.dump()
+
+    def dump(self):
+        path = self.directory / f'{os.getpid()}.json'
+        temporary = path.with_suffix('.tmp')
+        with self.lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temporary.write_text(json.dumps([
+                [list(labels), series]
+                for labels, series in self.series.items()
+            ]))
+            os.replace(temporary, path)
+
+    def collect(self):
+        """Данные всех воркеров, если задан каталог, иначе процесса."""
+        if self.directory is None:
+            with self.lock:
+                return json.loads(json.dumps(
+                    [[list(labels), series]
+                     for labels, series in self.series.items()]
+                ))
+        self.dump()
+        collected = {}
+        for path in self.directory.glob('*.json'):
+            try:
+                worker_series = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            for labels, series in worker_series:
+                merge(collected, tuple(labels), series)
+        return [[list(labels), series] for labels, series in collected.items()]
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        collected = self.collect()
+        lines = []
+        for name, metric, help_text, buckets in HISTOGRAMS:
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} histogram')
+            for labels, series in sorted(collected, key=lambda item: item[0]):
+                view, method, status = (escape(label) for label in labels)
+                label_text = (
+                    f'view="{view}",method="{method}",status="{status}"')
+                histogram = series[name]
+                cumulative = 0
+                for bound, count in zip(
+                        (*buckets, '+Inf'), histogram['buckets']):
+                    cumulative += count
+                    lines.append(
+                        f'{metric}_bucket{{{label_text},le="{bound}"}} '
+                        f'{cumulative}'
+                    )
+                lines.append(
+                    f'{metric}_sum{{{label_text}}} {histogram["sum"]}')
+                lines.append(f'{metric}_count{{{label_text}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def merge(collected, labels, series):
+    target = collected.get(labels)
+    if target is None:
+        collected[labels] = series
+        return
+    for name, histogram in series.items():
+        target[name]['sum'] += histogram['sum']
+        target[name]['buckets'] = [
+            left + right for left, right in zip(
+                target[name]['buckets'], histogram['buckets'])
+        ]
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def get_view_name(request):
+    """Имя представления и действия, например RecipeViewSet.list."""
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return f'{match.func.__module__}.{match.func.__name__}'
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+metrics = Metrics(METRICS_DIR)
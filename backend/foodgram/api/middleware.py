@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import re
+import uuid
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.deprecation import MiddlewareMixin
+
+from api.metrics import RequestStats, current_request, get_view_name, metrics
+from api.nplusone import NPlusOneError, detect_nplusone
+
+logger = logging.getLogger('foodgram.requests')
+
+REQUEST_ID_PATTERN = re.compile(r'^[\w.-]{1,128}$')
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+    Замеряет время ответа, число SQL-запросов и время в базе для каждого
+    представления, пишет их в лог вместе с идентификатором запроса и
+    возвращает идентификатор в заголовке X-Request-ID.
+
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.acall(request)
+        token = self.start(request)
+        response = self.get_response(request)
+        return self.finish(request, response, token)
+
+    async def acall(self, request):
+        token = self.start(request)
+        response = await self.get_response(request)
+        return self.finish(request, response, token)
+
+    @staticmethod
+    def start(request):
+        request_id = request.headers.get('X-Request-ID', '')
+        if not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        return current_request.set(RequestStats(request_id))
+
+    @staticmethod
+    def finish(request, response, token):
+        stats = current_request.get()
+        current_request.reset(token)
+        duration = perf_counter() - stats.started
+        view = get_view_name(request)
+        metrics.observe(
+            (view, request.method, response.status_code),
+            duration=duration,
+            queries=stats.queries,
+            db_duration=stats.db_duration,
+        )
+        logger.info(
+            'request_id=%s method=%s path=%s view=%s status=%s '
+            'duration_ms=%.1f queries=%s db_ms=%.1f',
+            stats.request_id, request.method, request.path, view,
+            response.status_code, duration * 1000, stats.queries,
+            stats.db_duration * 1000,
+        )
+        response['X-Request-ID'] = stats.request_id
+        return response
+
+
+class NPlusOneMiddleware(MiddlewareMixin):
+    """
+    Ищет N+1 в каждом запросе, если включён NPLUSONE_DETECTION: при
+    значении log пишет отчёт в лог, при raise выбрасывает NPlusOneError.
+
+    """
+
+    def __init__(self, get_response):
+        if settings.NPLUSONE_DETECTION not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.acall(request)
+        with detect_nplusone(raise_error=False) as tracker:
+            response = self.get_response(request)
+        return self.finish(request, response, tracker)
+
+    async def acall(self, request):
+        with detect_nplusone(raise_error=False) as tracker:
+            response = await self.get_response(request)
+        return self.finish(request, response, tracker)
+
+    @staticmethod
+    def finish(request, response, tracker):
+        if not tracker.repeated():
+            return response
+        message = (
+            f'N+1 в {request.method} {request.path} '
+            f'({get_view_name(request)}):\n{tracker.report()}'
+        )
+        if settings.NPLUSONE_DETECTION == 'raise':
+            raise NPlusOneError(message)
+        logger.warning(message)
+        return response
@@ -0,0 +1,173 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import close_old_connections, connections
+from django.db.models import prefetch_related_objects
+from django.http import FileResponse
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from foodgram.settings import (ASYNC_READ_VIEW_THREADS, ASYNC_READ_VIEWS,
+                               CATALOG_CACHE_TIMEOUT,
+                               RECIPE_FRAGMENT_CACHE_TIMEOUT)
+from recipes.signals import get_catalog_version
+
+read_executor = ThreadPoolExecutor(
+    max_workers=ASYNC_READ_VIEW_THREADS, thread_name_prefix='read-view')
+
+
+def run_read_view(view, request, *args, **kwargs):
+    """
+    Выполняет синхронное представление в потоке из read_executor и
+    полностью готовит ответ, чтобы цикл событий только отправлял байты.
+
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response = response.render()
+        if response.streaming and not isinstance(response, FileResponse):
+            response.streaming_content = list(response)
+        return response
+    finally:
+        close_old_connections()
+
+
+def close_request_connections(**kwargs):
+    """
+    В режиме ASGI закрывает соединения потока, в котором выполнялись
+    изменяющие представления и синхронные middleware. Такой поток
+    создаётся на каждый запрос, и его постоянное соединение осталось бы
+    открытым. Потоки read_executor сигнал request_finished не получают
+    и держат соединения CONN_MAX_AGE секунд.
+
+    """
+    connections.close_all()
+
+
+class CatalogCacheMixin:
+    """
+    Кэширует список справочника под его текущей версией и отдаёт версию
+    в заголовке ETag, чтобы клиент мог получить ответ 304 Not Modified.
+    Версия хранится в базе, поэтому изменение справочника в любом
+    процессе сбрасывает кэш и ETag во всех воркерах не позже чем через
+    CATALOG_VERSION_TIMEOUT секунд.
+
+    """
+    catalog_version = None
+
+    def get_catalog_version(self):
+        """Версия справочника, прочитанная один раз за запрос."""
+        if self.catalog_version is None:
+            self.catalog_version = get_catalog_version(self.queryset.model)
+        return self.catalog_version
+
+    def get_catalog_etag(self):
+        return f'"{self.get_catalog_version()}"'
+
+    def is_not_modified(self, request, etag):
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        return etag in etags or '*' in etags
+
+    def catalog_response(self, data, etag):
+        if data is None:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_catalog_etag()
+        if self.is_not_modified(request, etag):
+            return self.catalog_response(None, etag)
+        cache_key = f'catalog:{self.queryset.model._meta.label_lower}:{etag}'
+        data = cache.get(cache_key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(cache_key, data, CATALOG_CACHE_TIMEOUT)
+        return self.catalog_response(data, etag)
+
+
+class RecipeFragmentCacheMixin:
+    """
+    Кэширует общую для всех пользователей часть представления рецепта
+    под его версией. Признаки избранного, списка покупок и подписки
+    на автора берутся из аннотаций того же запроса, что и рецепты.
+
+    """
+
+    def get_fragment_prefetches(self):
+        return ()
+
+    def get_fragment_key(self, recipe):
+        base_url = self.request.build_absolute_uri('/')
+        return f'recipe_fragment:{recipe.pk}:{recipe.version}:{base_url}'
+
+    def serialize_recipes(self, recipes):
+        keys = [self.get_fragment_key(recipe) for recipe in recipes]
+        fragments = cache.get_many(keys)
+        missing = {
+            key: recipe for key, recipe in zip(keys, recipes)
+            if key not in fragments
+        }
+        if missing:
+            prefetch_related_objects(
+                list(missing.values()), *self.get_fragment_prefetches())
+            serializer = self.get_serializer(
+                list(missing.values()), many=True)
+            fresh = dict(zip(missing, serializer.data))
+            cache.set_many(fresh, RECIPE_FRAGMENT_CACHE_TIMEOUT)
+            fragments.update(fresh)
+        data = []
+        for key, recipe in zip(keys, recipes):
+            fragment = fragments[key]
+            fragment['is_favorited'] = recipe.is_favorited
+            fragment['is_in_shopping_cart'] = recipe.is_in_shopping_cart
+            fragment['author']['is_subscribed'] = recipe.is_author_subscribed
+            data.append(fragment)
+        return data
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_recipes(page))
+        return Response(self.serialize_recipes(list(queryset)))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.serialize_recipes([self.get_object()])[0])
+
+
+class AsyncReadMixin:
+    """
+    В режиме ASGI превращает представление в корутину: безопасные
+    запросы выполняются в общем пуле потоков фиксированного размера,
+    остальные — как обычные синхронные представления.
+
+    """
+
+    @classmethod
+    def as_view(cls, *args, **kwargs):
+        view = super().as_view(*args, **kwargs)
+        if not ASYNC_READ_VIEWS:
+            return view
+        read_view = sync_to_async(
+            partial(run_read_view, view),
+            thread_sensitive=False,
+            executor=read_executor,
+        )
+        write_view = sync_to_async(view, thread_sensitive=True)
+
+        @wraps(view)
+        async def async_view(request, *args, **kwargs):
+            if request.method in SAFE_METHODS:
+                return await read_view(request, *args, **kwargs)
+            return await write_view(request, *args, **kwargs)
+
+        return async_view
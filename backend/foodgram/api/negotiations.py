@@ -0,0 +1,11 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.settings import APISettings
+
+
+class FileFormatContentNegotiation(DefaultContentNegotiation):
+    """
+    Не выбирает рендерер по параметру format: в выгрузках файлов
+    он задаёт формат файла, а не формат ответа API.
+
+    """
+    settings = APISettings(user_settings={'URL_FORMAT_OVERRIDE': None})
@@ -0,0 +1,153 @@
+import re
+import sysconfig
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+FINGERPRINT_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%s|\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+IGNORED_FILES = (
+    Path(__file__).resolve(),
+    Path(__file__).resolve().with_name('metrics.py'),
+    Path(__file__).resolve().with_name('middleware.py'),
+    Path(__file__).resolve().with_name('test_runner.py'),
+    Path(settings.BASE_DIR).resolve() / 'manage.py',
+)
+
+IGNORED_DIRS = (Path(settings.BASE_DIR).resolve() / 'foodgram' / 'db',)
+
+LIBRARY_DIRS = tuple({
+    Path(sysconfig.get_path(name)).resolve()
+    for name in ('stdlib', 'platstdlib', 'purelib', 'platlib')
+})
+
+LIBRARY_DIR_NAMES = {'site-packages', 'dist-packages'}
+
+current_tracker = ContextVar('nplusone_tracker', default=None)
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """Форма запроса: литералы и списки параметров заменены на ?."""
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def is_library(path):
+    return (
+        not LIBRARY_DIR_NAMES.isdisjoint(path.parts)
+        or any(path.is_relative_to(library) for library in LIBRARY_DIRS)
+    )
+
+
+def find_caller():
+    """
+    Ближайший к запросу кадр стека не из библиотек: представление,
+    сериализатор или тест, из которого вызван код DRF и Django.
+    Точки входа вроде manage.py и тестового раннера пропускаются.
+
+    """
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith('<'):
+            continue
+        path = Path(frame.filename).resolve()
+        if (
+            not is_library(path)
+            and path not in IGNORED_FILES
+            and not any(path.is_relative_to(ignored)
+                        for ignored in IGNORED_DIRS)
+        ):
+            return frame
+    return None
+
+
+class QueryTracker:
+    """
+    Считает SQL-запросы по форме и запоминает, откуда в коде проекта
+    форма была вызвана впервые.
+
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.shapes = Counter()
+        self.callers = {}
+
+    def record(self, sql):
+        shape = fingerprint(sql)
+        self.shapes[shape] += 1
+        if shape not in self.callers:
+            self.callers[shape] = find_caller()
+
+    def repeated(self):
+        return [
+            (shape, count, self.callers[shape])
+            for shape, count in self.shapes.most_common()
+            if count > self.threshold
+        ]
+
+    def report(self):
+        lines = []
+        for shape, count, caller in self.repeated():
+            lines.append(f'{count} x {shape}')
+            if caller is not None:
+                lines.append(
+                    f'    {caller.filename}:{caller.lineno} '
+                    f'in {caller.name}: {caller.line}'
+                )
+        return '\n'.join(lines)
+
+
+def track_query(execute, sql, params, many, context):
+    tracker = current_tracker.get()
+    if tracker is not None:
+        tracker.record(sql)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_tracker(sender, connection, **kwargs):
+    if track_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_query)
+
+
+@contextmanager
+def detect_nplusone(threshold=None, raise_error=True):
+    """
+    Отслеживает запросы внутри блока и, если одна форма запроса
+    повторилась больше threshold раз, выбрасывает NPlusOneError
+    с отчётом или, при raise_error=False, только отдаёт трекер.
+
+        with detect_nplusone():
+            client.get('/api/recipes/')
+
+    """
+    if threshold is None:
+        threshold = settings.NPLUSONE_THRESHOLD
+    for connection in connections.all():
+        install_query_tracker(None, connection)
+    tracker = QueryTracker(threshold)
+    token = current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        current_tracker.reset(token)
+    if raise_error and tracker.repeated():
+        raise NPlusOneError(
+            f'Повторяющиеся SQL-запросы (N+1):\n{tracker.report()}')
@@ -1,13 +1,20 @@
+import json
+
 from django.core.validators import MinValueValidator
 from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
+from rest_framework.utils import html
 from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
 
-from foodgram.settings import MIN_COOKING_TIME, MIN_INGREDIENT_AMOUNT
+from foodgram.settings import (BULK_RECIPES_LIMIT, MIN_COOKING_TIME,
+                               MIN_INGREDIENT_AMOUNT)
+from api.fields import ImageRenditionsField, RecipeImageField
 from recipes.models import (Cart, Favorite, Ingredient, IngredientRecipe,
-                            Recipe, Tag)
+                            Recipe, Tag, TagRecipe)
+from recipes.shopping_list import change_shopping_lists, lock_recipes
+from recipes.signals import bump_shopping_cart_version
 from users.serializers import UserSerializer
 
 
@@ -28,10 +35,25 @@ class IngredientRecipeSerializer(ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount',)
 
 
+class FormListSerializer(serializers.ListSerializer):
+    """
+    В multipart/form-data список можно передать одним полем
+    с JSON-массивом, а не только ключами вида ingredients[0]id.
+
+    """
+
+    def get_value(self, dictionary):
+        value = dictionary.get(self.field_name)
+        if html.is_html_input(dictionary) and isinstance(value, str):
+            try:
+                return json.loads(value)
+            except ValueError:
+                return value
+        return super().get_value(dictionary)
+
+
 class WriteIngredientRecipeSerializer(ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(
         validators=(
             MinValueValidator(
@@ -45,6 +67,7 @@ class WriteIngredientRecipeSerializer(ModelSerializer):
     class Meta:
         model = IngredientRecipe
         fields = ('id', 'amount')
+        list_serializer_class = FormListSerializer
 
 
 class TagSerializer(ModelSerializer):
@@ -71,6 +94,7 @@ class ReadRecipeSerializer(ModelSerializer):
         read_only=True
     )
     image = Base64ImageField()
+    image_renditions = ImageRenditionsField()
     is_favorited = serializers.SerializerMethodField(
         method_name='get_is_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField(
@@ -80,15 +104,19 @@ class ReadRecipeSerializer(ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
                   'is_in_shopping_cart', 'name', 'image',
-                  'text', 'cooking_time',)
+                  'image_renditions', 'text', 'cooking_time',)
 
-    def get_is_favorited(self, obj) -> Favorite:
+    def get_is_favorited(self, obj) -> bool:
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
         return Favorite.objects.filter(user=request.user, recipe=obj).exists()
 
-    def get_is_in_shopping_cart(self, obj) -> Favorite:
+    def get_is_in_shopping_cart(self, obj) -> bool:
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -102,7 +130,7 @@ class WriteRecipeSerializer(ModelSerializer):
     )
     tags = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all())
-    image = Base64ImageField()
+    image = RecipeImageField()
     cooking_time = serializers.IntegerField(
         validators=(
             MinValueValidator(
@@ -118,48 +146,109 @@ class WriteRecipeSerializer(ModelSerializer):
         fields = ('ingredients', 'tags', 'image', 'name', 'text',
                   'cooking_time')
 
+    def validate(self, data):
+        ingredient_ids = [
+            ingredient.get('id')
+            for ingredient in data.get('ingredientrecipes', ())
+        ]
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise serializers.ValidationError(
+                {'errors': 'нельзя добавить два одинаковых ингредиента'}
+            )
+        missing_ids = set(ingredient_ids) - set(
+            Ingredient.objects.filter(
+                id__in=ingredient_ids).values_list('id', flat=True)
+        )
+        if missing_ids:
+            raise serializers.ValidationError(
+                {'errors': f'Ингредиенты не существуют: {sorted(missing_ids)}'}
+            )
+        return data
+
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
+    @staticmethod
+    def set_ingredients(recipe, ingredients, created=False):
+        """
+        Приводит ингредиенты рецепта к переданному списку: добавляет новые,
+        обновляет изменившиеся количества и удаляет лишние. Возвращает
+        изменение количества каждого ингредиента.
+
+        """
+        amounts = {
+            ingredient.get('id'): ingredient.get('amount')
+            for ingredient in ingredients
+        }
+        current = {} if created else {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in IngredientRecipe.objects.filter(
+                recipe=recipe)
+        }
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        )
+        changes = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        }
+        changed = []
+        for ingredient_id, ingredient_recipe in current.items():
+            amount = amounts.get(ingredient_id, 0)
+            changes[ingredient_id] = amount - ingredient_recipe.amount
+            if amount and amount != ingredient_recipe.amount:
+                ingredient_recipe.amount = amount
+                changed.append(ingredient_recipe)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ('amount',))
+        removed = current.keys() - amounts.keys()
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        return changes
+
     @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request')
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredientrecipes')
         recipe = Recipe.objects.create(author=request.user, **validated_data)
-        recipe.tags.set(tags)
-        for ingredient in ingredients:
-            amount = ingredient.get('amount')
-            base_ingredient = ingredient.get('id')
-            if (IngredientRecipe.objects.filter(
-                    recipe=recipe, ingredient=base_ingredient).exists()):
-                raise serializers.ValidationError(
-                    {'errors': 'нельзя добавить два одинаковых ингредиента'}
-                )
-            IngredientRecipe.objects.create(
-                recipe=recipe, ingredient=base_ingredient, amount=amount)
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tag) for tag in set(tags))
+        self.set_ingredients(recipe, ingredients, created=True)
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredientrecipes')
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-        tags = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.image = validated_data.get('image', instance.image)
+        ingredients = validated_data.pop('ingredientrecipes', None)
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            lock_recipes((instance.id,))
+            changes = self.set_ingredients(instance, ingredients)
+            change_shopping_lists(
+                Cart.objects.filter(
+                    recipe=instance).values_list('user_id', flat=True),
+                changes
+            )
+            bump_shopping_cart_version(carts__recipe=instance)
+        if 'image' in validated_data:
+            instance.image = validated_data.get('image')
+            instance.image_renditions = False
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get(
             'cooking_time', instance.cooking_time)
-        for ingredient in ingredients:
-            amount = ingredient.get('amount')
-            base_ingredient = ingredient.get('id')
-            if (IngredientRecipe.objects.filter(
-                    recipe=instance, ingredient=base_ingredient).exists()):
-                raise serializers.ValidationError(
-                    {'errors': 'нельзя добавить два одинаковых ингредиента'}
-                )
-            IngredientRecipe.objects.create(
-                recipe=instance, ingredient=base_ingredient, amount=amount
-            )
         instance.save()
         return instance
 
@@ -213,3 +302,11 @@ class CartSerializer(ModelSerializer):
         user = validated_data.get('user')
         recipe = validated_data.get('recipe')
         return Cart.objects.create(user=user, recipe=recipe)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RECIPES_LIMIT,
+    )
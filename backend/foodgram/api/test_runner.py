@@ -0,0 +1,26 @@
+import logging
+import os
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+request_logger = logging.getLogger('foodgram.requests')
+
+
+class NPlusOneTestRunner(DiscoverRunner):
+    """
+    Запускает тесты с NPLUSONE_DETECTION=raise: любой запрос тестового
+    клиента с N+1 падает с NPlusOneError. Журнал запросов пишется
+    с уровня WARNING, если REQUEST_LOG_LEVEL не задан явно.
+
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.NPLUSONE_DETECTION = 'raise'
+        self.request_log_level = request_logger.level
+        request_logger.setLevel(os.getenv('REQUEST_LOG_LEVEL', 'WARNING'))
+
+    def teardown_test_environment(self, **kwargs):
+        request_logger.setLevel(self.request_log_level)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,454 @@
+import tempfile
+from pathlib import Path
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.http import JsonResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import path
+from rest_framework.test import APITestCase
+
+from api.nplusone import NPlusOneError, detect_nplusone, fingerprint
+from api.serializers import ReadRecipeSerializer
+from recipes.models import (Cart, CatalogVersion, Favorite, Ingredient,
+                            IngredientRecipe, Recipe, ShoppingListItem, Tag,
+                            TagRecipe)
+from recipes.signals import get_catalog_version
+from users.models import Follow, User
+
+RECIPES_COUNT = 120
+
+PAGE_SIZES = (1, 6, 100)
+
+# Список: COUNT, страница рецептов и по запросу на автора, теги
+# и ингредиенты для фрагментов, которых нет в кэше
+LIST_QUERIES_COLD = 5
+
+LIST_QUERIES_WARM = 2
+
+# Рецепт: сам рецепт и те же три запроса для фрагмента
+DETAIL_QUERIES_COLD = 4
+
+DETAIL_QUERIES_WARM = 1
+
+# Авторов в тестах N+1: по запросу на каждого при сериализации
+AUTHORS_COUNT = 10
+
+
+class RecipeQueryCountTest(APITestCase):
+    """
+    Число SQL-запросов списка и страницы рецепта не зависит от размера
+    страницы, пользователя и того, есть ли фрагменты рецептов в кэше.
+
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = User.objects.bulk_create(
+            User(
+                username=f'author_{number}',
+                email=f'author_{number}@example.com',
+                first_name=f'Имя {number}',
+                last_name=f'Фамилия {number}',
+            )
+            for number in range(5)
+        )
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев', password='pass',
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(10)
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag_{number}')
+            for number in range(3)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}',
+                image='recipes/test.png',
+                text=f'Описание рецепта {number}',
+                cooking_time=number % 60 + 1,
+            )
+            for number in range(RECIPES_COUNT)
+        )
+        recipes = list(Recipe.objects.order_by('id'))
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=recipe,
+                ingredient=ingredients[(number + shift) % len(ingredients)],
+                amount=shift + 1,
+            )
+            for number, recipe in enumerate(recipes)
+            for shift in range(3)
+        )
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tags[(number + shift) % len(tags)])
+            for number, recipe in enumerate(recipes)
+            for shift in range(2)
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::3])
+        Cart.objects.bulk_create(
+            Cart(user=cls.user, recipe=recipe) for recipe in recipes[::4])
+        Follow.objects.create(user=cls.user, author=authors[0])
+        cls.recipe = recipes[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def check_list(self):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                cache.clear()
+                url = f'/api/recipes/?limit={limit}'
+                cold = self.get(url, LIST_QUERIES_COLD)
+                warm = self.get(url, LIST_QUERIES_WARM)
+                self.assertEqual(len(cold.data['results']), limit)
+                self.assertEqual(cold.data, warm.data)
+
+    def check_detail(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        cold = self.get(url, DETAIL_QUERIES_COLD)
+        warm = self.get(url, DETAIL_QUERIES_WARM)
+        self.assertEqual(cold.data, warm.data)
+        return warm.data
+
+    def test_list_anonymous(self):
+        self.check_list()
+
+    def test_list_authenticated(self):
+        self.client.force_authenticate(self.user)
+        self.check_list()
+
+    def test_detail_anonymous(self):
+        data = self.check_detail()
+        self.assertFalse(data['is_favorited'])
+        self.assertFalse(data['author']['is_subscribed'])
+
+    def test_detail_authenticated(self):
+        self.client.force_authenticate(self.user)
+        data = self.check_detail()
+        self.assertTrue(data['is_favorited'])
+        self.assertTrue(data['is_in_shopping_cart'])
+        self.assertTrue(data['author']['is_subscribed'])
+
+    def test_cached_fragment_is_not_shared_between_users(self):
+        self.client.force_authenticate(self.user)
+        self.get(f'/api/recipes/{self.recipe.id}/', DETAIL_QUERIES_COLD)
+        self.client.force_authenticate(None)
+        data = self.get(
+            f'/api/recipes/{self.recipe.id}/', DETAIL_QUERIES_WARM).data
+        self.assertFalse(data['is_favorited'])
+        self.assertFalse(data['is_in_shopping_cart'])
+        self.assertFalse(data['author']['is_subscribed'])
+
+
+class CatalogVersionTest(APITestCase):
+    """
+    Автодополнение и списки справочников с прогретым кэшем не ходят
+    в базу, а изменение справочника сразу меняет их ответ и ETag.
+
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Сахар', 'Соль', 'Сливки')
+        )
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+
+    def setUp(self):
+        cache.clear()
+
+    def autocomplete(self, query):
+        response = self.client.get(
+            '/api/ingredients/autocomplete/', {'name': query})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_warm_autocomplete_runs_no_queries(self):
+        self.assertEqual(self.autocomplete('с'), ['Сахар', 'Сливки', 'Соль'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.autocomplete('сл'), ['Сливки'])
+
+    def test_change_is_visible_at_once(self):
+        self.assertEqual(self.autocomplete('сл'), ['Сливки'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Сливочное масло',
+                                      measurement_unit='г')
+        self.assertEqual(
+            self.autocomplete('сл'), ['Сливки', 'Сливочное масло'])
+
+    def test_tags_etag(self):
+        response = self.client.get('/api/tags/')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Ужин', color='#49B64E', slug='dinner')
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_version_from_other_process_after_timeout(self):
+        version = get_catalog_version(Tag)
+        CatalogVersion.objects.filter(catalog='recipes.tag').update(
+            version=uuid4())
+        self.assertEqual(get_catalog_version(Tag), version)
+        cache.clear()
+        self.assertNotEqual(get_catalog_version(Tag), version)
+
+
+def recipe_authors(request):
+    authors = []
+    for recipe in Recipe.objects.order_by('id'):
+        authors.append(recipe.author.username)
+    return JsonResponse({'authors': authors})
+
+
+urlpatterns = [path('authors/', recipe_authors)]
+
+
+class FingerprintTest(SimpleTestCase):
+
+    def test_literals_are_replaced(self):
+        self.assertEqual(
+            fingerprint(
+                "SELECT \"t1\".\"id\" FROM \"t1\" "
+                "WHERE \"t1\".\"id\" = 15 AND \"t1\".\"name\" = 'O''Neil' "
+                "AND \"t1\".\"price\" > 2.5"
+            ),
+            'SELECT "t1"."id" FROM "t1" '
+            'WHERE "t1"."id" = ? AND "t1"."name" = ? AND "t1"."price" > ?',
+        )
+
+    def test_placeholders_are_replaced(self):
+        self.assertEqual(
+            fingerprint('SELECT 1 FROM "t" WHERE "t"."id" = %s LIMIT 21'),
+            'SELECT ? FROM "t" WHERE "t"."id" = ? LIMIT ?',
+        )
+
+    def test_in_lists_of_any_length_match(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "t"."id" IN (%s)'),
+            fingerprint('SELECT * FROM "t" WHERE "t"."id" IN (1, 2,  3)'),
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "t"."id" IN (%s, %s)'),
+            'SELECT * FROM "t" WHERE "t"."id" IN (...)',
+        )
+
+    def test_whitespace_is_collapsed(self):
+        self.assertEqual(
+            fingerprint('  SELECT *\n\tFROM "t"   WHERE "t"."id" = %s\n'),
+            'SELECT * FROM "t" WHERE "t"."id" = ?',
+        )
+
+
+class NPlusOneDetectionTest(TestCase):
+    """
+    Повтор одной формы запроса больше порога: detect_nplusone и
+    NPlusOneMiddleware в режимах log и raise.
+
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = User.objects.bulk_create(
+            User(username=f'author_{number}',
+                 email=f'author_{number}@example.com')
+            for number in range(AUTHORS_COUNT)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {number}',
+                   image='recipes/test.png', text='Описание',
+                   cooking_time=number + 1)
+            for number, author in enumerate(authors)
+        )
+
+    def serialize_recipes(self):
+        return ReadRecipeSerializer(
+            Recipe.objects.order_by('id'), many=True).data
+
+    def test_repeated_queries_raise(self):
+        with self.assertRaisesMessage(NPlusOneError, 'users_user'):
+            with detect_nplusone(threshold=3):
+                self.serialize_recipes()
+
+    def test_no_raise_below_threshold(self):
+        with detect_nplusone(threshold=AUTHORS_COUNT) as tracker:
+            self.serialize_recipes()
+        self.assertEqual(tracker.repeated(), [])
+
+    def test_no_raise_with_raise_error_false(self):
+        with detect_nplusone(threshold=3, raise_error=False) as tracker:
+            self.serialize_recipes()
+        shapes = [shape for shape, _, _ in tracker.repeated()]
+        self.assertTrue(any('users_user' in shape for shape in shapes))
+
+    def test_prefetched_queryset_passes(self):
+        with detect_nplusone(threshold=1):
+            ReadRecipeSerializer(
+                Recipe.objects.select_related('author').prefetch_related(
+                    'tags', 'ingredientrecipes__ingredient'),
+                many=True,
+            ).data
+
+    def test_caller_is_project_code_not_entry_point(self):
+        """Запрос из DRF отнесён к вызвавшему сериализацию коду."""
+        with detect_nplusone(threshold=3, raise_error=False) as tracker:
+            self.serialize_recipes()
+        callers = [caller for _, _, caller in tracker.repeated()]
+        self.assertTrue(callers)
+        for caller in callers:
+            self.assertEqual(
+                Path(caller.filename).resolve(), Path(__file__).resolve())
+            self.assertEqual(caller.name, 'serialize_recipes')
+
+    def test_caller_outside_base_dir(self):
+        """Код вне BASE_DIR не подменяется на manage.py или раннер."""
+        filename = str(Path(tempfile.gettempdir()) / 'outside_project.py')
+        code = compile(
+            'def serialize(queryset):\n'
+            '    return ReadRecipeSerializer(queryset, many=True).data\n',
+            filename, 'exec',
+        )
+        namespace = {'ReadRecipeSerializer': ReadRecipeSerializer}
+        exec(code, namespace)
+        with detect_nplusone(threshold=3, raise_error=False) as tracker:
+            namespace['serialize'](Recipe.objects.order_by('id'))
+        callers = [caller for _, _, caller in tracker.repeated()]
+        self.assertTrue(callers)
+        for caller in callers:
+            self.assertEqual(caller.filename, filename)
+            self.assertEqual(caller.name, 'serialize')
+
+    @override_settings(ROOT_URLCONF=__name__, NPLUSONE_DETECTION='log',
+                       NPLUSONE_THRESHOLD=3)
+    def test_middleware_logs(self):
+        with self.assertLogs('foodgram.requests', 'WARNING') as logs:
+            response = self.client.get('/authors/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('N+1 в GET /authors/', logs.output[0])
+        self.assertIn('in recipe_authors', logs.output[0])
+
+    @override_settings(ROOT_URLCONF=__name__, NPLUSONE_DETECTION='raise',
+                       NPLUSONE_THRESHOLD=3)
+    def test_middleware_raises(self):
+        with self.assertRaisesMessage(NPlusOneError, 'in recipe_authors'):
+            self.client.get('/authors/')
+
+    @override_settings(ROOT_URLCONF=__name__, NPLUSONE_DETECTION='raise',
+                       NPLUSONE_THRESHOLD=AUTHORS_COUNT)
+    def test_middleware_passes_below_threshold(self):
+        self.assertEqual(self.client.get('/authors/').status_code, 200)
+
+
+class ShoppingListTest(APITestCase):
+    """
+    Список покупок совпадает с суммой ингредиентов рецептов из корзины
+    после изменений корзины через API и ингредиентов через админку.
+
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(3)
+        )
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(author=cls.admin, name=f'Рецепт {number}',
+                   image='recipes/test.png', text='Описание',
+                   cooking_time=number + 1)
+            for number in range(3)
+        )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                             amount=10 * (number + 1) + shift)
+            for number, recipe in enumerate(cls.recipes)
+            for shift, ingredient in enumerate(cls.ingredients[number:])
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def check_shopping_list(self):
+        expected = dict(IngredientRecipe.objects.filter(
+            recipe__carts__user=self.user
+        ).values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total').order_by())
+        self.assertEqual(dict(ShoppingListItem.objects.filter(
+            user=self.user).values_list('ingredient_id', 'amount')), expected)
+
+    def test_single_add_and_delete(self):
+        for recipe in self.recipes:
+            response = self.client.post(
+                f'/api/recipes/{recipe.id}/shopping_cart/')
+            self.assertEqual(response.status_code, 201)
+            self.check_shopping_list()
+        response = self.client.delete(
+            f'/api/recipes/{self.recipes[0].id}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.check_shopping_list()
+
+    def test_bulk_add_delete_and_clear(self):
+        recipe_ids = [recipe.id for recipe in self.recipes]
+        response = self.client.post(
+            '/api/recipes/shopping_cart/', {'recipes': recipe_ids},
+            format='json')
+        self.assertEqual(response.status_code, 201)
+        self.check_shopping_list()
+        response = self.client.delete(
+            '/api/recipes/shopping_cart/', {'recipes': recipe_ids[:2]},
+            format='json')
+        self.assertEqual(response.status_code, 204)
+        self.check_shopping_list()
+        response = self.client.delete('/api/recipes/shopping_cart/clear/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(ShoppingListItem.objects.filter(user=self.user))
+
+    def test_admin_ingredient_change(self):
+        Cart.objects.create(user=self.user, recipe=self.recipes[0])
+        ingredient = self.ingredients[0]
+        version = User.objects.get(pk=self.user.pk).shopping_cart_version
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            f'/admin/recipes/ingredient/{ingredient.id}/change/', {
+                'name': ingredient.name,
+                'measurement_unit': 'кг',
+                'ingredientrecipes-TOTAL_FORMS': 0,
+                'ingredientrecipes-INITIAL_FORMS': 0,
+            })
+        self.assertEqual(response.status_code, 302)
+        self.check_shopping_list()
+        self.assertGreater(
+            User.objects.get(pk=self.user.pk).shopping_cart_version, version)
+
+    def test_ingredient_delete(self):
+        Cart.objects.create(user=self.user, recipe=self.recipes[0])
+        version = User.objects.get(pk=self.user.pk).shopping_cart_version
+        self.ingredients[0].delete()
+        self.check_shopping_list()
+        self.assertGreater(
+            User.objects.get(pk=self.user.pk).shopping_cart_version, version)
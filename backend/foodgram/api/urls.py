@@ -1,8 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (FavoriteViewSet, IngredientViewSet, RecipeViewSet,
-                       TagViewSet)
+from api.views import (FavoriteViewSet, IngredientViewSet, ReadinessView,
+                       RecipeViewSet, TagViewSet)
 
 app_name = 'api'
 router = DefaultRouter()
@@ -17,5 +17,6 @@ router.register(
 )
 
 urlpatterns = [
+    path('health/ready/', ReadinessView.as_view(), name='readiness'),
     path('', include(router.urls)),
 ]
@@ -1,5 +1,14 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+import csv
+import json
+from io import BytesIO
+
+from django.core.cache import cache
+from django.db import (DatabaseError, connection, connections, router,
+                       transaction)
+from django.db.models import (Count, Exists, F, FloatField, OuterRef,
+                              Prefetch, Q, Value)
+from django.db.models.functions import Cast
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from reportlab.pdfbase import pdfmetrics
@@ -7,24 +16,81 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from foodgram.settings import NAME_SHOPPING_CART_PDF
+from foodgram.db import get_pool_stats
+from foodgram.settings import (INGREDIENTS_AUTOCOMPLETE_LIMIT,
+                               NAME_SHOPPING_CART, NAME_SHOPPING_CART_PDF,
+                               SHOPPING_CART_EXPORT_CHUNK_SIZE,
+                               SHOPPING_CART_PDF_CACHE_TIMEOUT)
+from recipes.counters import change_counters
 from recipes.models import (Cart, Favorite, Ingredient, IngredientRecipe,
-                            Recipe, Tag)
+                            Recipe, ShoppingListItem, Tag)
+from recipes.shopping_list import (change_shopping_lists, get_recipe_amounts,
+                                   lock_recipes)
+from recipes.signals import bump_shopping_cart_version
+from users.models import Follow, User
 from users.serializers import RecipesBriefSerializer
+from api.autocomplete import ingredient_index
 from api.filters import IngredientSearchFilter, RecipeFilter
-from api.paginations import CustomPagination
+from api.metrics import metrics
+from api.mixins import (AsyncReadMixin, CatalogCacheMixin,
+                        RecipeFragmentCacheMixin)
+from api.negotiations import FileFormatContentNegotiation
+from api.paginations import CustomPagination, FeedPagination
 from api.permissions import AuthorOrReadOnly
 from api.serializers import (CartSerializer, FavoriteSerializer,
                              IngredientSerializer, ReadRecipeSerializer,
-                             TagSerializer, WriteRecipeSerializer)
+                             RecipeIdsSerializer, TagSerializer,
+                             WriteRecipeSerializer)
 
 CONTENT_TYPE = 'application/pdf'
 
+EXPORT_CONTENT_TYPES = {
+    'txt': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'json': 'application/json; charset=utf-8',
+}
+
+
+class Echo:
+    """Отдаёт записанную строку обратно, не накапливая её в памяти."""
+
+    def write(self, value):
+        return value
+
+
+def delete_user_recipes(model, user, recipe_ids=None):
+    """
+    Удаляет связи пользователя с рецептами (избранное, список покупок)
+    одним DELETE. QuerySet.delete() вызвал бы обработчики pre_delete
+    и post_delete для каждой строки, поэтому запрос выполняется
+    напрямую, а их работу вызывающий код делает пачкой.
+
+    """
+    database = connections[router.db_for_write(model)]
+    quote = database.ops.quote_name
+    sql = (
+        f'DELETE FROM {quote(model._meta.db_table)} '
+        f'WHERE {quote(model._meta.get_field("user").column)} = %s'
+    )
+    params = [user.id]
+    if recipe_ids is not None:
+        sql += (
+            f' AND {quote(model._meta.get_field("recipe").column)} '
+            f'IN ({", ".join(["%s"] * len(recipe_ids))})'
+        )
+        params.extend(recipe_ids)
+    with database.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(AsyncReadMixin, CatalogCacheMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Возвращает список всех ингредиентов или конкретный ингредиент."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -32,15 +98,41 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ('^name',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        if IngredientSearchFilter.search_param in request.query_params:
+            return self.autocomplete(request)
+        return super().list(request, *args, **kwargs)
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(
+        detail=False,
+        url_path='autocomplete',
+        url_name='autocomplete',
+    )
+    def autocomplete(self, request):
+        """Подсказывает ингредиенты по началу или части названия."""
+        etag = self.get_catalog_etag()
+        if self.is_not_modified(request, etag):
+            return self.catalog_response(None, etag)
+        limit = request.query_params.get('limit', '')
+        limit = int(limit) if limit.isdigit() and int(limit) > 0 else (
+            INGREDIENTS_AUTOCOMPLETE_LIMIT)
+        return self.catalog_response(ingredient_index.search(
+            request.query_params.get(IngredientSearchFilter.search_param, ''),
+            limit,
+            self.get_catalog_version(),
+        ), etag)
+
+
+class TagViewSet(AsyncReadMixin, CatalogCacheMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """Возвращает список всех тегов или конкретный тег."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AsyncReadMixin, RecipeFragmentCacheMixin,
+                    viewsets.ModelViewSet):
     """
     Позволяет получить список всех рецептов, конкретный рецепт,
     создать/изменить/удалить свой рецепт.
@@ -48,17 +140,53 @@ class RecipeViewSet(viewsets.ModelViewSet):
     """
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
-    paginations_class = CustomPagination
+    pagination_class = FeedPagination
+    parser_classes = (JSONParser, MultiPartParser)
     permission_classes = (AuthorOrReadOnly,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_anonymous:
+            is_favorited = is_in_shopping_cart = is_subscribed = Value(False)
+        else:
+            is_favorited = Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            )
+            is_in_shopping_cart = Exists(
+                Cart.objects.filter(user=user, recipe=OuterRef('pk'))
+            )
+            is_subscribed = Exists(
+                Follow.objects.filter(user=user, author=OuterRef('author'))
+            )
+        return self.queryset.annotate(
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart,
+            is_author_subscribed=is_subscribed,
+        )
+
+    def get_fragment_prefetches(self):
+        return (
+            Prefetch(
+                'author',
+                queryset=User.objects.annotate(is_subscribed=Value(False))
+            ),
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'ingredientrecipes',
+                queryset=IngredientRecipe.objects.select_related('ingredient')
+            ),
+        )
+
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PATCH', 'DELETE'):
             return WriteRecipeSerializer
         return ReadRecipeSerializer
 
+    @transaction.atomic
     def add_or_del_object(self, model, pk, serializer, errors):
-        recipe = get_object_or_404(Recipe, id=pk)
+        recipe = get_object_or_404(Recipe.objects.select_for_update(), id=pk)
+        self.lock_user(self.request.user)
         serializer = serializer(
             data={'user': self.request.user.id, 'recipe': recipe.id}
         )
@@ -76,10 +204,73 @@ class RecipeViewSet(viewsets.ModelViewSet):
         object.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @staticmethod
+    def lock_user(user):
+        """
+        Блокирует строку пользователя до конца транзакции. Её берут
+        и одиночные, и массовые изменения избранного и списка покупок,
+        чтобы снимок «что уже добавлено» не устарел до записи и счётчики
+        не учли один рецепт дважды. Затронутые рецепты блокируются
+        раньше (lock_recipes), как и при правке рецепта.
+
+        """
+        list(User.objects.select_for_update().filter(
+            id=user.id).values_list('id', flat=True))
+
+    def bulk_add_or_del(self, model, counter_field):
+        """
+        Добавляет (POST) или удаляет (DELETE) рецепты из списка
+        {"recipes": [id, ...]} одной транзакцией: один запрос проверяет
+        рецепты и их наличие у пользователя, один bulk_create или DELETE
+        меняет связи, счётчики и список покупок обновляются пачкой.
+
+        """
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = set(serializer.validated_data['recipes'])
+        user = self.request.user
+        adding = self.request.method == 'POST'
+        with transaction.atomic():
+            lock_recipes(recipe_ids)
+            self.lock_user(user)
+            recipes = list(Recipe.objects.filter(id__in=recipe_ids).annotate(
+                is_added=Exists(model.objects.filter(
+                    user=user, recipe=OuterRef('pk')))
+            ))
+            missing_ids = recipe_ids - {recipe.id for recipe in recipes}
+            if missing_ids:
+                return Response(
+                    {'errors': f'Рецепты не существуют: '
+                               f'{sorted(missing_ids)}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            changed_ids = [
+                recipe.id for recipe in recipes if recipe.is_added != adding]
+            if changed_ids:
+                if adding:
+                    model.objects.bulk_create(
+                        (model(user=user, recipe_id=recipe_id)
+                         for recipe_id in changed_ids),
+                        ignore_conflicts=True
+                    )
+                else:
+                    delete_user_recipes(model, user, changed_ids)
+                sign = 1 if adding else -1
+                change_counters(Recipe, counter_field, changed_ids, sign)
+                if model is Cart:
+                    change_shopping_lists(
+                        (user.id,), get_recipe_amounts(changed_ids, sign))
+                    bump_shopping_cart_version(id=user.id)
+        if adding:
+            serializer = RecipesBriefSerializer(recipes, many=True)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @staticmethod
     def creating_pdf(dictionary, pdf_file):
         begin_position_x, begin_position_y = 30, 730
-        pdfmetrics.registerFont(TTFont('TNR', 'times.ttf'))
+        if 'TNR' not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont('TNR', 'times.ttf'))
         pdf_file.setFont('TNR', 25)
         pdf_file.setTitle('Список покупок')
         pdf_file.drawString(
@@ -101,6 +292,101 @@ class RecipeViewSet(viewsets.ModelViewSet):
         pdf_file.showPage()
         return pdf_file.save()
 
+    @staticmethod
+    def export_txt(ingredients):
+        yield 'Список покупок:\n'
+        for number, item in enumerate(ingredients, start=1):
+            yield (
+                f'{number}: {item["ingredient__name"]} - '
+                f'{item["ingredient_total"]}'
+                f'{item["ingredient__measurement_unit"]}\n'
+            )
+
+    @staticmethod
+    def export_csv(ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for item in ingredients:
+            yield writer.writerow((
+                item['ingredient__name'],
+                item['ingredient__measurement_unit'],
+                item['ingredient_total'],
+            ))
+
+    @staticmethod
+    def export_json(ingredients):
+        yield '['
+        for number, item in enumerate(ingredients):
+            yield (',' if number else '') + json.dumps({
+                'name': item['ingredient__name'],
+                'measurement_unit': item['ingredient__measurement_unit'],
+                'amount': item['ingredient_total'],
+            }, ensure_ascii=False)
+        yield ']'
+
+    @staticmethod
+    def get_shopping_cart_ingredients(user):
+        return ShoppingListItem.objects.filter(user=user).values(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            ingredient_total=F('amount'),
+        ).order_by('ingredient__name')
+
+    @staticmethod
+    def get_coverage_queryset(queryset, ingredient_ids):
+        """
+        Рецепты, в которых есть хотя бы один из ингредиентов, с долей
+        имеющихся ингредиентов рецепта и числом недостающих. Рецепты
+        находятся по индексу (ingredient, recipe), а доля считается
+        одной группировкой строк IngredientRecipe только этих рецептов.
+
+        """
+        return queryset.filter(Exists(IngredientRecipe.objects.filter(
+            recipe=OuterRef('pk'), ingredient_id__in=ingredient_ids
+        ))).annotate(
+            matched=Count(
+                'ingredientrecipes',
+                filter=Q(ingredientrecipes__ingredient_id__in=ingredient_ids)
+            ),
+            total=Count('ingredientrecipes'),
+        ).annotate(
+            coverage=Cast('matched', FloatField()) / F('total'),
+            missing=F('total') - F('matched'),
+        ).order_by('-coverage', 'missing', '-id')
+
+    @action(
+        detail=False,
+        url_path='by_ingredients',
+        url_name='by_ingredients',
+        pagination_class=CustomPagination,
+    )
+    def by_ingredients(self, request):
+        """
+        Что можно приготовить из ингредиентов ?ingredients=1,2,3: рецепты
+        по убыванию доли имеющихся ингредиентов и числу недостающих.
+
+        """
+        ingredient_ids = [
+            item.strip()
+            for value in request.query_params.getlist('ingredients')
+            for item in value.split(',') if item.strip()
+        ]
+        if not ingredient_ids or not all(
+                item.isdigit() for item in ingredient_ids):
+            return Response(
+                {'errors': 'Укажите id ингредиентов в параметре ingredients'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        recipes = self.paginate_queryset(self.get_coverage_queryset(
+            self.filter_queryset(self.get_queryset()),
+            {int(item) for item in ingredient_ids}
+        ))
+        data = self.serialize_recipes(recipes)
+        for recipe, item in zip(recipes, data):
+            item['coverage'] = round(recipe.coverage, 3)
+            item['missing_ingredients'] = recipe.missing
+        return self.get_paginated_response(data)
+
     @action(
         detail=True,
         methods=('POST', 'DELETE'),
@@ -123,34 +409,128 @@ class RecipeViewSet(viewsets.ModelViewSet):
         errors = 'У вас нет данного рецепта в списке покупок'
         return self.add_or_del_object(Cart, pk, CartSerializer, errors)
 
+    @action(
+        detail=False,
+        methods=('POST', 'DELETE'),
+        url_path='favorite',
+        url_name='bulk_favorite',
+        permission_classes=(IsAuthenticated,)
+    )
+    def bulk_favorite(self, request):
+        return self.bulk_add_or_del(Favorite, 'favorites_count')
+
+    @action(
+        detail=False,
+        methods=('POST', 'DELETE'),
+        url_path='shopping_cart',
+        url_name='bulk_shopping_cart',
+        permission_classes=(IsAuthenticated,)
+    )
+    def bulk_shopping_cart(self, request):
+        return self.bulk_add_or_del(Cart, 'carts_count')
+
+    @action(
+        detail=False,
+        methods=('DELETE',),
+        url_path='shopping_cart/clear',
+        url_name='clear_shopping_cart',
+        permission_classes=(IsAuthenticated,)
+    )
+    def clear_shopping_cart(self, request):
+        user = request.user
+        with transaction.atomic():
+            lock_recipes(Cart.objects.filter(user=user).values('recipe_id'))
+            self.lock_user(user)
+            Recipe.objects.filter(carts__user=user).update(
+                carts_count=F('carts_count') - 1)
+            delete_user_recipes(Cart, user)
+            ShoppingListItem.objects.filter(user=user).delete()
+            bump_shopping_cart_version(id=user.id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(
         detail=False,
         url_path='download_shopping_cart',
         url_name='download_shopping_cart',
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=FileFormatContentNegotiation,
     )
     def download_shopping_cart(self, request):
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__carts__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).order_by(
-            'ingredient__name'
-        ).annotate(ingredient_total=Sum('amount'))
-
-        response = HttpResponse(content_type=CONTENT_TYPE)
+        file_format = request.query_params.get('format', 'pdf')
+        if file_format == 'pdf':
+            return self.download_shopping_cart_pdf(request.user)
+        if file_format not in EXPORT_CONTENT_TYPES:
+            return Response(
+                {'errors': f'Неподдерживаемый формат: {file_format}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ingredients = self.get_shopping_cart_ingredients(
+            request.user
+        ).iterator(chunk_size=SHOPPING_CART_EXPORT_CHUNK_SIZE)
+        export = getattr(self, f'export_{file_format}')
+        response = StreamingHttpResponse(
+            export(ingredients),
+            content_type=EXPORT_CONTENT_TYPES[file_format]
+        )
         response['Content-Disposition'] = (
-            f'attachment; filename={NAME_SHOPPING_CART_PDF}')
-        pdf_file = canvas.Canvas(response)
-        self.creating_pdf(ingredients, pdf_file)
+            f'attachment; filename={NAME_SHOPPING_CART}.{file_format}')
         return response
 
+    def download_shopping_cart_pdf(self, user):
+        cache_key = (
+            f'shopping_cart_pdf:{user.id}:{user.shopping_cart_version}')
+        content = cache.get(cache_key)
+        if content is None:
+            buffer = BytesIO()
+            self.creating_pdf(
+                self.get_shopping_cart_ingredients(user),
+                canvas.Canvas(buffer)
+            )
+            content = buffer.getvalue()
+            cache.set(cache_key, content, SHOPPING_CART_PDF_CACHE_TIMEOUT)
+        return FileResponse(
+            BytesIO(content),
+            as_attachment=True,
+            filename=NAME_SHOPPING_CART_PDF,
+            content_type=CONTENT_TYPE,
+        )
+
 
 class FavoriteViewSet(viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = FeedPagination
 
     def get_queryset(self):
         recipe_id = self.kwargs.get('recipe_id')
         recipe = get_object_or_404(Recipe, id=recipe_id)
         return recipe.favorites.all()
+
+
+class ReadinessView(APIView):
+    """
+    Проверяет, что база данных отвечает, и отдаёт статистику пулов
+    соединений процесса. Для проб готовности балансировщика.
+
+    """
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except DatabaseError:
+            return Response(
+                {'database': 'unavailable', 'pools': get_pool_stats()},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return Response({'database': 'ok', 'pools': get_pool_stats()})
+
+
+def metrics_view(request):
+    """Метрики запросов в текстовом формате Prometheus."""
+    return HttpResponse(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -10,7 +10,15 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.core.signals import request_finished
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('ASYNC_READ_VIEWS', 'True')
 
 application = get_asgi_application()
+
+# Модули приложений импортируются после настройки Django
+from api.mixins import close_request_connections  # noqa: E402
+
+request_finished.connect(
+    close_request_connections, dispatch_uid='close_request_connections')
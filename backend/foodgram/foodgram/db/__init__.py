@@ -0,0 +1,6 @@
+pools = {}
+
+
+def get_pool_stats():
+    """Статистика пулов соединений текущего процесса по алиасам баз."""
+    return {alias: pool.stats() for alias, pool in pools.items()}
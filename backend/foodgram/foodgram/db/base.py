@@ -0,0 +1,72 @@
+from functools import partial
+from threading import Lock
+
+from django.conf import settings
+from django.db.backends.postgresql import base
+
+from foodgram.db import pools
+from foodgram.db.pool import ConnectionPool
+
+pools_lock = Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL с пулом соединений на процесс, если задан DB_POOL_MAX_SIZE,
+    и проверкой постоянного соединения перед первым запросом к базе
+    в каждом HTTP-запросе, если включён CONN_HEALTH_CHECKS.
+
+    Переопределяет внутренние методы бэкенда Django 4.0 и рассчитан
+    на psycopg2, поэтому версия Django закреплена в requirements.txt.
+
+    """
+    health_check_done = False
+
+    def get_pool(self, conn_params):
+        with pools_lock:
+            if self.alias not in pools:
+                pools[self.alias] = ConnectionPool(
+                    partial(super().get_new_connection, conn_params),
+                    settings.DB_POOL_MAX_SIZE,
+                    settings.DB_POOL_TIMEOUT,
+                )
+            return pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        if not settings.DB_POOL_MAX_SIZE:
+            return super().get_new_connection(conn_params)
+        connection = self.get_pool(conn_params).getconn()
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if not settings.DB_POOL_MAX_SIZE:
+            super()._close()
+            return
+        with self.wrap_database_errors:
+            pools[self.alias].putconn(self.connection)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        if (
+            self.connection is None
+            or self.health_check_done
+            or self.in_atomic_block
+            or not self.settings_dict.get('CONN_HEALTH_CHECKS')
+        ):
+            return
+        self.health_check_done = True
+        if not self.is_usable():
+            self.close()
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
@@ -0,0 +1,104 @@
+from collections import deque
+from threading import BoundedSemaphore, Lock
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул соединений psycopg2 на процесс. Перед выдачей
+    соединение проверяется запросом SELECT 1, неработающие соединения
+    закрываются и заменяются новыми. Если все max_size соединений
+    заняты, ждёт освобождения не дольше timeout секунд.
+
+    """
+
+    def __init__(self, connect, max_size, timeout):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle = deque()
+        self.in_use = 0
+        self.lock = Lock()
+        self.slots = BoundedSemaphore(max_size)
+        self.counters = {'opened': 0, 'broken': 0, 'timeouts': 0}
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def getconn(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            self.count('timeouts')
+            raise PoolTimeout(
+                f'Нет свободных соединений с базой за {self.timeout} с')
+        try:
+            connection = self.get_usable_connection()
+        except BaseException:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.in_use += 1
+        return connection
+
+    def get_usable_connection(self):
+        while True:
+            with self.lock:
+                connection = self.idle.pop() if self.idle else None
+            if connection is None:
+                connection = self.connect()
+                self.count('opened')
+                return connection
+            if self.is_usable(connection):
+                return connection
+            self.count('broken')
+            self.close(connection)
+
+    @staticmethod
+    def is_usable(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    @staticmethod
+    def close(connection):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def putconn(self, connection):
+        try:
+            if not connection.closed:
+                status = connection.info.transaction_status
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    self.close(connection)
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+        except psycopg2.Error:
+            self.close(connection)
+        with self.lock:
+            self.in_use -= 1
+            if not connection.closed:
+                self.idle.append(connection)
+        self.slots.release()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'max_size': self.max_size,
+                'size': self.in_use + len(self.idle),
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                **self.counters,
+            }
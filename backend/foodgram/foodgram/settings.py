@@ -39,6 +39,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +73,14 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 # Database
 
+# Пул соединений бэкенда foodgram.db: 0 отключает пул, иначе это
+# наибольшее число соединений процесса и время ожидания свободного, с.
+# С пулом соединение возвращается в него в конце каждого запроса
+
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 0))
+
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+
 DATABASES = {
     'default': {
         'ENGINE': os.getenv('DB_ENGINE'),
@@ -78,7 +88,22 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        'CONN_MAX_AGE': 0 if DB_POOL_MAX_SIZE else int(
+            os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+    }
+}
+
+
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
@@ -120,6 +145,14 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загружаемые файлы сразу пишутся во временный файл на диске, а не в память
+
+FILE_UPLOAD_HANDLERS = (
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+)
+
+FILE_UPLOAD_TEMP_DIR = os.getenv('FILE_UPLOAD_TEMP_DIR')
+
 # Default primary key field type
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -141,4 +174,89 @@ MIN_COOKING_TIME = 1
 
 MIN_INGREDIENT_AMOUNT = 1
 
-NAME_SHOPPING_CART_PDF = 'shopping_cart.pdf'
+BULK_RECIPES_LIMIT = 100
+
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сколько секунд версия справочника хранится в кэше, чтобы запросы
+# к справочникам не читали её из базы. Изменение справочника удаляет
+# версию из кэша; с кэшем в памяти процесса другие воркеры увидят
+# новую версию не позже чем через это время
+
+CATALOG_VERSION_TIMEOUT = int(os.getenv('CATALOG_VERSION_TIMEOUT', 5))
+
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Конфигурация полнотекстового поиска PostgreSQL; должна совпадать
+# с той, которой триггер из миграции recipes 0029 заполняет search_vector
+
+RECIPE_SEARCH_CONFIG = 'russian'
+
+# Метрики запросов для /metrics. Если задан METRICS_DIR, воркеры
+# сбрасывают туда свои данные раз в METRICS_DUMP_INTERVAL секунд,
+# и /metrics любого воркера отдаёт сумму по всем
+
+METRICS_DIR = os.getenv('METRICS_DIR')
+
+METRICS_DUMP_INTERVAL = 5
+
+METRICS_DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS_QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+# Поиск N+1: off, log или raise. NPLUSONE_THRESHOLD — сколько раз
+# один и тот же по форме SQL-запрос может повториться за HTTP-запрос
+
+NPLUSONE_DETECTION = os.getenv('NPLUSONE_DETECTION', 'off')
+
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 5))
+
+TEST_RUNNER = 'api.test_runner.NPlusOneTestRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.requests': {
+            'handlers': ('console',),
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Включается в foodgram/asgi.py: при запуске через ASGI чтение
+# выполняется в пуле потоков, не блокируя цикл событий
+
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+
+ASYNC_READ_VIEW_THREADS = int(os.getenv('ASYNC_READ_VIEW_THREADS', 8))
+
+BASE64_DECODE_CHUNK_SIZE = 256 * 1024
+
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': (300, 300),
+    'medium': (800, 800),
+}
+
+RECIPE_IMAGE_RENDITION_FORMAT = os.getenv(
+    'RECIPE_IMAGE_RENDITION_FORMAT', 'WEBP').upper()
+
+RECIPE_IMAGE_RENDITION_WORKERS = int(
+    os.getenv('RECIPE_IMAGE_RENDITION_WORKERS', 2))
+
+INGREDIENTS_AUTOCOMPLETE_LIMIT = 50
+
+NAME_SHOPPING_CART = 'shopping_cart'
+
+NAME_SHOPPING_CART_PDF = f'{NAME_SHOPPING_CART}.pdf'
+
+SHOPPING_CART_PDF_CACHE_TIMEOUT = 60 * 60 * 24
+
+SHOPPING_CART_EXPORT_CHUNK_SIZE = 500
@@ -3,6 +3,22 @@ from django.contrib import admin
 from recipes.models import (Cart, Favorite, Ingredient,
                             IngredientRecipe, Recipe, Tag,
                             TagRecipe)
+from recipes.shopping_list import lock_recipes, rebuild_shopping_lists
+from recipes.signals import bump_recipe_version, bump_shopping_cart_version
+from users.models import User
+
+
+def bump_inline_recipes(formsets):
+    """Помечает устаревшими рецепты, строки которых менялись в инлайнах."""
+    recipe_ids = set()
+    for formset in formsets:
+        for form in formset.forms:
+            if form.has_changed():
+                recipe_ids.update(
+                    (form.initial.get('recipe'), form.instance.recipe_id))
+    recipe_ids.discard(None)
+    if recipe_ids:
+        bump_recipe_version(id__in=recipe_ids)
 
 
 class TagRecipeInline(admin.TabularInline):
@@ -22,6 +38,21 @@ class IngredientAdmin(admin.ModelAdmin):
     empty_value_display = '-empty-'
     inlines = (IngredientRecipeInline,)
 
+    def save_related(self, request, form, formsets, change):
+        if change:
+            lock_recipes(IngredientRecipe.objects.filter(
+                ingredient=form.instance).values('recipe_id'))
+        super().save_related(request, form, formsets, change)
+        bump_inline_recipes(formsets)
+        if change:
+            rebuild_shopping_lists(list(User.objects.filter(
+                shopping_list__ingredient=form.instance
+            ).values_list('id', flat=True).order_by().union(
+                User.objects.filter(
+                    carts__recipe__ingredientrecipes__ingredient=form.instance
+                ).values_list('id', flat=True).order_by()
+            )))
+
 
 class TagAdmin(admin.ModelAdmin):
     list_display = ('name', 'color', 'slug',)
@@ -29,15 +60,33 @@ class TagAdmin(admin.ModelAdmin):
     empty_value_display = '-empty-'
     inlines = (TagRecipeInline,)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        bump_inline_recipes(formsets)
+
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'author', 'name',)
+    list_display = ('pk', 'author', 'name', 'favorites_count',
+                    'carts_count',)
+    readonly_fields = ('favorites_count', 'carts_count',)
     list_filter = ('tags',)
     search_fields = ('name', 'author__username', 'author__email')
     empty_value_display = '-empty-'
     filter_vertical = ('tags',)
     inlines = (TagRecipeInline, IngredientRecipeInline,)
 
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            obj.image_renditions = False
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change:
+            rebuild_shopping_lists(list(Cart.objects.filter(
+                recipe=form.instance).values_list('user_id', flat=True)))
+            bump_shopping_cart_version(carts__recipe=form.instance)
+
 
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'user',)
@@ -0,0 +1,51 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Cart, Favorite, Recipe
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'carts_count', Cart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def change_counter(model, field, pk, delta):
+    """Атомарно изменяет счётчик одной записи на delta."""
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def change_counters(model, field, pks, delta):
+    """Атомарно изменяет счётчик нескольких записей на delta."""
+    model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def reconcile_counters(batch_size):
+    """
+    Сверяет счётчики с фактическим количеством связанных записей пачками
+    по batch_size id и исправляет расхождения. Возвращает количество
+    исправленных записей по каждому счётчику.
+
+    """
+    fixed = {}
+    for model, field, related_model, related_field in COUNTERS:
+        actual = Coalesce(Subquery(
+            related_model.objects.filter(
+                **{related_field: OuterRef('pk')}
+            ).order_by().values(related_field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ), 0)
+        last_id = model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        label = f'{model._meta.model_name}.{field}'
+        fixed[label] = 0
+        for start in range(0, last_id + 1, batch_size):
+            fixed[label] += model.objects.filter(
+                pk__gte=start, pk__lt=start + batch_size
+            ).annotate(actual=actual).exclude(
+                **{field: F('actual')}
+            ).update(**{field: actual})
+    return fixed
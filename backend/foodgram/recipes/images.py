@@ -0,0 +1,83 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import F
+from PIL import Image, ImageOps, features
+
+from foodgram.settings import (RECIPE_IMAGE_RENDITION_FORMAT,
+                               RECIPE_IMAGE_RENDITION_WORKERS,
+                               RECIPE_IMAGE_RENDITIONS)
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=RECIPE_IMAGE_RENDITION_WORKERS,
+    thread_name_prefix='recipe-image',
+)
+
+
+def get_rendition_format():
+    if (RECIPE_IMAGE_RENDITION_FORMAT == 'WEBP'
+            and not features.check('webp')):
+        return 'JPEG'
+    return RECIPE_IMAGE_RENDITION_FORMAT
+
+
+def rendition_name(image_name, rendition):
+    """Возвращает путь уменьшенной копии рядом с оригиналом."""
+    path = PurePosixPath(image_name)
+    extension = get_rendition_format().lower().replace('jpeg', 'jpg')
+    return str(path.with_name(f'{path.stem}.{rendition}.{extension}'))
+
+
+def generate_renditions(image_name):
+    """
+    Создаёт уменьшенные копии изображения и отмечает рецепты, которые
+    всё ещё ссылаются на это изображение.
+
+    """
+    from recipes.models import Recipe
+
+    image_format = get_rendition_format()
+    try:
+        with default_storage.open(image_name) as file:
+            original = ImageOps.exif_transpose(Image.open(file))
+            original.load()
+        if image_format == 'JPEG' and original.mode != 'RGB':
+            original = original.convert('RGB')
+        for rendition, size in RECIPE_IMAGE_RENDITIONS.items():
+            name = rendition_name(image_name, rendition)
+            if default_storage.exists(name):
+                continue
+            image = original.copy()
+            image.thumbnail(size)
+            buffer = BytesIO()
+            image.save(buffer, image_format, quality=85)
+            saved_name = default_storage.save(
+                name, ContentFile(buffer.getvalue()))
+            if saved_name != name:
+                default_storage.delete(saved_name)
+    except Exception:
+        logger.exception('Не удалось создать превью %s', image_name)
+        return
+    Recipe.objects.filter(image=image_name).update(
+        image_renditions=True, version=F('version') + 1)
+
+
+def generate_renditions_in_background(image_name):
+    try:
+        generate_renditions(image_name)
+    finally:
+        connections.close_all()
+
+
+def schedule_renditions(recipe):
+    """Ставит создание превью в очередь после фиксации транзакции."""
+    image_name = recipe.image.name
+    transaction.on_commit(
+        lambda: executor.submit(generate_renditions_in_background, image_name))
@@ -0,0 +1,167 @@
+import random
+from io import BytesIO
+from itertools import islice
+from time import monotonic
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from recipes.counters import reconcile_counters
+from recipes.models import (Cart, Favorite, Ingredient, IngredientRecipe,
+                            Recipe, Tag, TagRecipe)
+from recipes.shopping_list import rebuild_shopping_lists
+from users.models import Follow, User
+
+IMAGE_NAME = 'recipes/generated.png'
+
+
+def batched(iterable, batch_size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Генерирует пользователей, рецепты, избранное, списки покупок '
+            'и подписки для нагрузочного тестирования.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--favorites', type=int, default=5000)
+        parser.add_argument('--carts', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=1000)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора: одинаковое зерно даёт одинаковые данные',
+        )
+        parser.add_argument(
+            '--prefix', default='bench',
+            help='Префикс имён пользователей и рецептов',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = f'{options["prefix"]}{options["seed"]}'
+        ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True))
+        tag_ids = list(Tag.objects.order_by('id').values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError('Сначала загрузите ингредиенты: load_data')
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(
+                f'Данные с префиксом {prefix} уже сгенерированы')
+        started = monotonic()
+        user_ids = self.create_users(prefix, options['users'])
+        recipe_ids = self.create_recipes(
+            prefix, user_ids, ingredient_ids, tag_ids, options['recipes'])
+        self.create_pairs(
+            Favorite, 'user_id', user_ids, 'recipe_id', recipe_ids,
+            options['favorites'])
+        self.create_pairs(
+            Cart, 'user_id', user_ids, 'recipe_id', recipe_ids,
+            options['carts'])
+        self.create_pairs(
+            Follow, 'user_id', user_ids, 'author_id', user_ids,
+            options['follows'], allow_same=False)
+        reconcile_counters(self.batch_size)
+        for start in range(0, len(user_ids), self.batch_size):
+            rebuild_shopping_lists(user_ids[start:start + self.batch_size])
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные с префиксом {prefix} сгенерированы '
+            f'за {monotonic() - started:.2f} с'
+        ))
+
+    def bulk_create(self, model, objects):
+        total = 0
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {total}')
+
+    def create_users(self, prefix, count):
+        password = make_password(prefix)
+        self.bulk_create(User, (
+            User(
+                username=f'{prefix}_{number}',
+                email=f'{prefix}_{number}@example.com',
+                first_name=f'Имя {number}',
+                last_name=f'Фамилия {number}',
+                password=password,
+            )
+            for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=f'{prefix}_'
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_image(self):
+        if not default_storage.exists(IMAGE_NAME):
+            buffer = BytesIO()
+            Image.new('RGB', (600, 400), (230, 120, 45)).save(buffer, 'PNG')
+            default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+        return IMAGE_NAME
+
+    def create_recipes(self, prefix, user_ids, ingredient_ids, tag_ids,
+                       count):
+        if not user_ids:
+            return []
+        image = self.create_image()
+        self.bulk_create(Recipe, (
+            Recipe(
+                author_id=self.random.choice(user_ids),
+                name=f'{prefix} рецепт {number}',
+                image=image,
+                text=f'Описание рецепта {number}',
+                cooking_time=self.random.randint(1, 180),
+            )
+            for number in range(count)
+        ))
+        recipe_ids = list(Recipe.objects.filter(
+            author_id__in=user_ids
+        ).order_by('id').values_list('id', flat=True))
+        self.bulk_create(IngredientRecipe, (
+            IngredientRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=self.random.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in self.random.sample(
+                ingredient_ids, min(len(ingredient_ids),
+                                    self.random.randint(3, 12)))
+        ))
+        if tag_ids:
+            self.bulk_create(TagRecipe, (
+                TagRecipe(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in self.random.sample(
+                    tag_ids, self.random.randint(1, min(len(tag_ids), 3)))
+            ))
+        return recipe_ids
+
+    def create_pairs(self, model, left_field, left_ids, right_field,
+                     right_ids, count, allow_same=True):
+        if not left_ids or not right_ids:
+            return
+        pairs = set()
+        attempts = count * 3
+        while len(pairs) < count and attempts:
+            attempts -= 1
+            left_id = self.random.choice(left_ids)
+            right_id = self.random.choice(right_ids)
+            if not allow_same and left_id == right_id:
+                continue
+            pairs.add((left_id, right_id))
+        self.bulk_create(model, (
+            model(**{left_field: left_id, right_field: right_id})
+            for left_id, right_id in sorted(pairs)
+        ))
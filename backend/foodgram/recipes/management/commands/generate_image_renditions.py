@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие уменьшенные копии изображений рецептов.'
+
+    def handle(self, *args, **options):
+        image_names = Recipe.objects.filter(
+            image_renditions=False
+        ).exclude(image='').values_list('image', flat=True).distinct()
+        total = 0
+        for image_name in image_names.iterator():
+            generate_renditions(image_name)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {total}'))
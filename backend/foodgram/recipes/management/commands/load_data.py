@@ -1,16 +1,122 @@
-from django.core.management.base import BaseCommand
+import csv
 import json
+from itertools import islice
+from pathlib import Path
+from time import monotonic
 
-from recipes.models import Ingredient
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Ingredient, Tag
+from recipes.signals import bump_catalog_version
+
+CATALOGS = {
+    Ingredient: ('name', 'measurement_unit'),
+    Tag: ('name', 'color', 'slug'),
+}
+
+
+def read_json(file):
+    """Разбирает JSON-массив объектов по мере чтения файла."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = finished = False
+    for chunk in iter(lambda: file.read(64 * 1024), ''):
+        buffer += chunk
+        while not finished:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != '[':
+                    raise CommandError('Ожидается JSON-массив объектов')
+                buffer = buffer[1:]
+                started = True
+                continue
+            buffer = buffer.lstrip(',').lstrip()
+            if buffer[:1] == ']':
+                finished = True
+                break
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                break
+            buffer = buffer[end:]
+            yield item
+    if not finished:
+        raise CommandError('Некорректный или неполный JSON-массив')
+
+
+def read_csv(file, fields):
+    reader = csv.reader(file)
+    for number, row in enumerate(reader):
+        if number == 0 and tuple(row) == fields:
+            continue
+        if row:
+            yield dict(zip(fields, row))
 
 
 class Command(BaseCommand):
+    help = ('Загружает ингредиенты и теги из JSON или CSV пачками, '
+            'пропуская уже существующие записи.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            default=str(Path(settings.BASE_DIR) / 'ingredients.json'),
+            help='Файл с ингредиентами (.json или .csv)',
+        )
+        parser.add_argument(
+            '--tags',
+            help='Файл с тегами (.json или .csv)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество записей в одном INSERT',
+        )
+
     def handle(self, *args, **options):
-        with open('ingredients.json', 'rb') as f:
-            data = json.load(f)
-            for i in data:
-                ingredient = Ingredient()
-                ingredient.name = i['name']
-                ingredient.measurement_unit = i['measurement_unit']
-                ingredient.save()
-                print(i['name'], i['measurement_unit'])
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        if options['ingredients']:
+            self.load(Ingredient, options['ingredients'],
+                      options['batch_size'])
+        if options['tags']:
+            self.load(Tag, options['tags'], options['batch_size'])
+
+    def read(self, path, fields):
+        path = Path(path)
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+        with open(path, encoding='utf-8', newline='') as file:
+            if path.suffix.lower() == '.csv':
+                yield from read_csv(file, fields)
+            else:
+                yield from read_json(file)
+
+    def load(self, model, path, batch_size):
+        fields = CATALOGS[model]
+        started = monotonic()
+        count_before = model.objects.count()
+        rows = (
+            model(**{field: item[field] for field in fields})
+            for item in self.read(path, fields)
+        )
+        total = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+        created = model.objects.count() - count_before
+        if created:
+            bump_catalog_version(model)
+        elapsed = monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{model._meta.verbose_name_plural}: прочитано {total}, '
+            f'добавлено {created}, пропущено {total - created} '
+            f'за {elapsed:.2f} с ({total / max(elapsed, 1e-6):.0f} зап./с)'
+        ))
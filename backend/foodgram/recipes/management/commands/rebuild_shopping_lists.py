@@ -0,0 +1,41 @@
+from time import monotonic
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Cart, ShoppingListItem
+from recipes.shopping_list import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает списки покупок пользователей по их корзинам. '
+            'Используется для восстановления после сбоев.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', nargs='+', type=int,
+            help='id пользователей; по умолчанию пересчитываются все',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество пользователей, пересчитываемых в одной '
+                 'транзакции',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        started = monotonic()
+        user_ids = options['users']
+        if user_ids is None:
+            user_ids = sorted(
+                set(Cart.objects.values_list('user_id', flat=True))
+                | set(ShoppingListItem.objects.values_list(
+                    'user_id', flat=True))
+            )
+        batch_size = options['batch_size']
+        for start in range(0, len(user_ids), batch_size):
+            rebuild_shopping_lists(user_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересчитаны для {len(user_ids)} пользователей '
+            f'за {monotonic() - started:.2f} с'
+        ))
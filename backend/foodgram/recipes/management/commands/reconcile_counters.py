@@ -0,0 +1,26 @@
+from time import monotonic
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики избранного, списков покупок, рецептов и '
+            'подписчиков с фактическими данными и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество записей, проверяемых одним запросом',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        started = monotonic()
+        for label, fixed in reconcile_counters(
+                options['batch_size']).items():
+            self.stdout.write(f'{label}: исправлено {fixed}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики сверены за {monotonic() - started:.2f} с'))
@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        kept_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    for duplicate in duplicates:
+        extra_ids = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(id=duplicate['kept_id']).values_list('id', flat=True)
+        used_recipe_ids = set(IngredientRecipe.objects.filter(
+            ingredient_id=duplicate['kept_id']
+        ).values_list('recipe_id', flat=True))
+        for ingredient_recipe in IngredientRecipe.objects.filter(
+                ingredient_id__in=list(extra_ids)):
+            if ingredient_recipe.recipe_id in used_recipe_ids:
+                ingredient_recipe.delete()
+                continue
+            ingredient_recipe.ingredient_id = duplicate['kept_id']
+            ingredient_recipe.save(update_fields=('ingredient',))
+            used_recipe_ids.add(ingredient_recipe.recipe_id)
+        Ingredient.objects.filter(id__in=list(extra_ids)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_alter_recipe_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def remove_duplicate_tagrecipes(apps, schema_editor):
+    TagRecipe = apps.get_model('recipes', 'TagRecipe')
+    duplicates = TagRecipe.objects.values(
+        'recipe', 'tag'
+    ).annotate(
+        kept_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    for duplicate in duplicates:
+        TagRecipe.objects.filter(
+            recipe_id=duplicate['recipe'], tag_id=duplicate['tag']
+        ).exclude(id=duplicate['kept_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_ingredient_ingredient_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_tagrecipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.4 on 2026-10-18 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0024_fill_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Сколько раз рецепт добавили в список покупок', verbose_name='В списках покупок'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Сколько раз рецепт добавили в избранное', verbose_name='В избранном'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0026_fill_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_renditions',
+            field=models.BooleanField(default=False, editable=False, help_text='Уменьшенные копии изображения созданы', verbose_name='Превью изображения готовы'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0027_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Увеличивается при изменении рецепта, его тегов, ингредиентов или автора', verbose_name='Версия'),
+        ),
+    ]
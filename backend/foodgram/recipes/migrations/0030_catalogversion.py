@@ -0,0 +1,26 @@
+# Generated by Django 4.0.4 on 2026-10-18 19:02
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0029_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('catalog', models.CharField(help_text='Метка модели справочника, например recipes.tag', max_length=100, unique=True, verbose_name='Справочник')),
+                ('version', models.UUIDField(default=uuid.uuid4, help_text='Меняется при каждом изменении справочника', verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия справочника',
+                'verbose_name_plural': 'Версии справочников',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-18 19:17
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0030_catalogversion'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='shoppinglistitem',
+            options={'verbose_name': 'Позиция списка покупок', 'verbose_name_plural': 'Позиции списка покупок'},
+        ),
+    ]
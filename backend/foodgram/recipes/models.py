@@ -1,9 +1,12 @@
+from uuid import uuid4
+
 from colorfield.fields import ColorField
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
 from foodgram.settings import MIN_COOKING_TIME, MIN_INGREDIENT_AMOUNT
-from users.models import User
+from users.models import DenormalizedFieldsMixin, User
 
 
 class Ingredient(models.Model):
@@ -22,6 +25,12 @@ class Ingredient(models.Model):
         ordering = ('name',)
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='ingredient_unique'
+            ),
+        )
 
     def __str__(self) -> str:
         return self.name
@@ -55,7 +64,30 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class CatalogVersion(models.Model):
+    catalog = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Справочник',
+        help_text='Метка модели справочника, например recipes.tag',
+    )
+    version = models.UUIDField(
+        default=uuid4,
+        verbose_name='Версия',
+        help_text='Меняется при каждом изменении справочника',
+    )
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self) -> str:
+        return f'{self.catalog}: {self.version}'
+
+
+class Recipe(DenormalizedFieldsMixin, models.Model):
+    denormalized_fields = (
+        'favorites_count', 'carts_count', 'version', 'search_vector')
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -73,6 +105,12 @@ class Recipe(models.Model):
         verbose_name='Изображение',
         help_text='Добавьте изображение'
     )
+    image_renditions = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Превью изображения готовы',
+        help_text='Уменьшенные копии изображения созданы',
+    )
     text = models.CharField(
         max_length=6144,
         verbose_name='Текст',
@@ -104,11 +142,41 @@ class Recipe(models.Model):
             ),
         )
     )
+    favorites_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+        help_text='Сколько раз рецепт добавили в избранное',
+    )
+    carts_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок',
+        help_text='Сколько раз рецепт добавили в список покупок',
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия',
+        help_text=('Увеличивается при изменении рецепта, его тегов, '
+                   'ингредиентов или автора'),
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+        help_text=('Заполняется триггером PostgreSQL по названию '
+                   'и тексту рецепта'),
+    )
 
     class Meta:
         ordering = ('-id',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('author', '-id'), name='recipe_author_id_idx'),
+        )
 
     def __str__(self) -> str:
         return self.name
@@ -176,6 +244,10 @@ class TagRecipe(models.Model):
         ordering = ('-id',)
         verbose_name = 'Рецепты с тегами'
         verbose_name_plural = 'Рецепты с тегами'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'tag'), name='tagrecipe_unique'),
+        )
 
     def __str__(self) -> str:
         return f'{self.tag} для {self.recipe}'
@@ -237,3 +309,35 @@ class Cart(models.Model):
 
     def __str__(self) -> str:
         return f'{self.recipe} в списке у {self.user.username}'
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+        help_text='Укажите пользователя',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+        help_text='Укажите ингредиент',
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+        help_text='Суммарное количество по рецептам из списка покупок',
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'), name='shopping_list_unique'),
+        )
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+
+    def __str__(self) -> str:
+        return f'{self.ingredient} в списке у {self.user.username}'
@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from recipes.models import IngredientRecipe, Recipe, ShoppingListItem
+from users.models import User
+
+
+def get_recipe_amounts(recipe_ids, sign=1):
+    """Возвращает суммарное количество каждого ингредиента в рецептах."""
+    return {
+        ingredient_id: sign * total
+        for ingredient_id, total in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total').order_by()
+    }
+
+
+def lock_recipes(recipe_ids):
+    """
+    Блокирует строки рецептов до конца транзакции. Правка ингредиентов
+    рецепта и изменения корзин с ним идут по очереди: ни одна сторона
+    не прочитает количества или владельцев корзин до записи другой.
+    Рецепты блокируются раньше пользователей, чтобы не было взаимных
+    блокировок.
+
+    """
+    list(Recipe.objects.select_for_update().filter(
+        id__in=recipe_ids).order_by('id').values_list('id', flat=True))
+
+
+@transaction.atomic
+def change_shopping_lists(user_ids, changes):
+    """
+    Прибавляет к спискам покупок пользователей изменения количеств
+    ингредиентов и удаляет позиции, количество которых стало нулевым.
+
+    """
+    changes = {
+        ingredient_id: delta
+        for ingredient_id, delta in changes.items() if delta
+    }
+    user_ids = list(user_ids)
+    if not user_ids or not changes:
+        return
+    list(User.objects.select_for_update().filter(
+        id__in=user_ids).values_list('id', flat=True))
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=changes)
+    existing = set(items.values_list('user_id', 'ingredient_id'))
+    items.update(amount=F('amount') + Case(
+        *(When(ingredient_id=ingredient_id, then=Value(delta))
+          for ingredient_id, delta in changes.items()),
+        default=Value(0),
+    ))
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=user_id, ingredient_id=ingredient_id, amount=delta)
+        for user_id in user_ids
+        for ingredient_id, delta in changes.items()
+        if delta > 0 and (user_id, ingredient_id) not in existing
+    )
+    ShoppingListItem.objects.filter(
+        user_id__in=user_ids, amount__lte=0).delete()
+
+
+@transaction.atomic
+def rebuild_shopping_lists(user_ids):
+    """Пересчитывает списки покупок пользователей по их корзинам."""
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=row['recipe__carts__user_id'],
+            ingredient_id=row['ingredient_id'],
+            amount=row['total'],
+        )
+        for row in IngredientRecipe.objects.filter(
+            recipe__carts__user_id__in=user_ids
+        ).values(
+            'recipe__carts__user_id', 'ingredient_id'
+        ).annotate(total=Sum('amount')).order_by()
+    )
@@ -0,0 +1,155 @@
+from functools import partial
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from foodgram.settings import CATALOG_VERSION_TIMEOUT
+from recipes.counters import change_counter
+from recipes.images import schedule_renditions
+from recipes.models import (Cart, CatalogVersion, Favorite, Ingredient,
+                            Recipe, Tag)
+from recipes.shopping_list import change_shopping_lists, get_recipe_amounts
+from users.models import Follow, User
+
+# Поля автора, которые входят в представление рецепта
+RECIPE_AUTHOR_FIELDS = frozenset(
+    ('email', 'username', 'first_name', 'last_name'))
+
+
+def get_catalog_version_key(model):
+    return f'catalog_version:{model._meta.label_lower}'
+
+
+def get_catalog_version(model):
+    """
+    Возвращает текущую версию справочника. Версия хранится в базе,
+    поэтому её изменение видят все воркеры и команды управления,
+    а читается из кэша, пока не истечёт CATALOG_VERSION_TIMEOUT.
+
+    """
+    key = get_catalog_version_key(model)
+    version = cache.get(key)
+    if version is None:
+        catalog, _ = CatalogVersion.objects.get_or_create(
+            catalog=model._meta.label_lower)
+        version = catalog.version.hex
+        cache.set(key, version, CATALOG_VERSION_TIMEOUT)
+    return version
+
+
+def bump_catalog_version(model):
+    """Помечает устаревшими все закэшированные копии справочника."""
+    CatalogVersion.objects.update_or_create(
+        catalog=model._meta.label_lower, defaults={'version': uuid4()})
+    transaction.on_commit(
+        partial(cache.delete, get_catalog_version_key(model)))
+
+
+def bump_shopping_cart_version(**lookups):
+    """Помечает устаревшими списки покупок подходящих пользователей."""
+    User.objects.filter(**lookups).update(
+        shopping_cart_version=F('shopping_cart_version') + 1)
+
+
+def bump_recipe_version(**lookups):
+    """Помечает устаревшими закэшированные представления рецептов."""
+    Recipe.objects.filter(**lookups).update(version=F('version') + 1)
+
+
+@receiver((post_save, post_delete), sender=Cart)
+def cart_changed(sender, instance, **kwargs):
+    bump_shopping_cart_version(id=instance.user_id)
+
+
+@receiver(post_save, sender=Cart)
+def cart_created(sender, instance, created, **kwargs):
+    if created:
+        change_shopping_lists(
+            (instance.user_id,), get_recipe_amounts((instance.recipe_id,)))
+
+
+@receiver(pre_delete, sender=Cart)
+def cart_deleted(sender, instance, **kwargs):
+    change_shopping_lists(
+        (instance.user_id,),
+        get_recipe_amounts((instance.recipe_id,), sign=-1)
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_shopping_cart_version(
+            carts__recipe__ingredientrecipes__ingredient=instance)
+        bump_recipe_version(ingredients=instance)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    bump_shopping_cart_version(
+        carts__recipe__ingredientrecipes__ingredient=instance)
+    bump_recipe_version(ingredients=instance)
+
+
+@receiver((post_save, pre_delete), sender=Tag)
+def tag_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        bump_recipe_version(tags=instance)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version(sender)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def favorite_counter_changed(sender, instance, signal, created=True, **kwargs):
+    if created:
+        change_counter(Recipe, 'favorites_count', instance.recipe_id,
+                       1 if signal is post_save else -1)
+
+
+@receiver((post_save, post_delete), sender=Cart)
+def cart_counter_changed(sender, instance, signal, created=True, **kwargs):
+    if created:
+        change_counter(Recipe, 'carts_count', instance.recipe_id,
+                       1 if signal is post_save else -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    if instance.image and not instance.image_renditions:
+        schedule_renditions(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_recipe_version(pk=instance.pk)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if not created and (
+        update_fields is None or RECIPE_AUTHOR_FIELDS & update_fields
+    ):
+        bump_recipe_version(author=instance)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_counter_changed(sender, instance, signal, created=True, **kwargs):
+    if created:
+        change_counter(User, 'recipes_count', instance.author_id,
+                       1 if signal is post_save else -1)
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def follow_counter_changed(sender, instance, signal, created=True, **kwargs):
+    if created:
+        change_counter(User, 'followers_count', instance.author_id,
+                       1 if signal is post_save else -1)
@@ -5,7 +5,8 @@ from users.models import Follow, User
 
 
 class UserAdmin(UserAdmin):
-    list_display = ('email', 'first_name', 'last_name', 'username')
+    list_display = ('email', 'first_name', 'last_name', 'username',
+                    'recipes_count', 'followers_count')
     search_fields = ('username', 'email')
     empty_value_display = '-empty-'
 
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_follow_follow_follow_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='shopping_cart_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Увеличивается при каждом изменении списка покупок', verbose_name='Версия списка покупок'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.4 on 2026-10-18 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_shopping_cart_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Сколько пользователей подписаны на пользователя', verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Сколько рецептов опубликовал пользователь', verbose_name='Количество рецептов'),
+        ),
+    ]
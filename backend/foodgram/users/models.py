@@ -3,9 +3,31 @@ from django.db import models
 from django.db.models import constraints
 
 
-class User(AbstractUser):
+class DenormalizedFieldsMixin:
+    """
+    Не перезаписывает при сохранении поля из denormalized_fields: их
+    значения меняются атомарными UPDATE в обход экземпляра модели, и
+    полное сохранение загруженного ранее объекта вернуло бы устаревшие
+    значения.
+
+    """
+    denormalized_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.denormalized_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(DenormalizedFieldsMixin, AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('first_name', 'last_name', 'username')
+    denormalized_fields = (
+        'shopping_cart_version', 'recipes_count', 'followers_count')
     username = models.CharField(
         unique=True,
         max_length=50,
@@ -29,6 +51,24 @@ class User(AbstractUser):
         verbose_name='Адрес электронной почты',
         help_text='Укажите адрес электронной почты',
     )
+    shopping_cart_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия списка покупок',
+        help_text='Увеличивается при каждом изменении списка покупок',
+    )
+    recipes_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов',
+        help_text='Сколько рецептов опубликовал пользователь',
+    )
+    followers_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков',
+        help_text='Сколько пользователей подписаны на пользователя',
+    )
 
     class Meta:
         ordering = ('username',)
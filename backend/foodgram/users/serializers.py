@@ -2,6 +2,7 @@ from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 from rest_framework.validators import UniqueTogetherValidator
 
+from api.fields import ImageRenditionsField
 from recipes.models import Recipe
 from users.models import Follow, User
 
@@ -16,6 +17,8 @@ class UserSerializer(ModelSerializer):
                   'last_name', 'is_subscribed',)
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -53,36 +56,44 @@ class FollowSerializer(serializers.ModelSerializer):
 
 
 class RecipesBriefSerializer(serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
 
 
 class ResponeSubscribeSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed')
     recipes = serializers.SerializerMethodField(method_name='get_recipes')
-    recipes_count = serializers.SerializerMethodField(
-        method_name='get_recipes_count')
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name',
                   'last_name', 'is_subscribed', 'recipes', 'recipes_count')
 
-    def get_is_subscribed(self, obj) -> Follow:
+    @staticmethod
+    def get_recipes_limit(request):
+        recipes_limit = request.query_params.get('recipes_limit')
+        if recipes_limit is None or not recipes_limit.isdigit():
+            return None
+        return int(recipes_limit)
+
+    def get_is_subscribed(self, obj) -> bool:
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
         return Follow.objects.filter(user=request.user, author=obj).exists()
 
     def get_recipes(self, obj) -> dict:
+        if hasattr(obj, 'limited_recipes'):
+            return RecipesBriefSerializer(obj.limited_recipes, many=True).data
         request = self.context.get('request')
-        recipes_limit = request.POST.get('recipes_limit')
+        recipes_limit = self.get_recipes_limit(request)
         queryset = obj.recipes.all()
-        if recipes_limit:
-            queryset = queryset[:(recipes_limit)]
+        if recipes_limit is not None:
+            queryset = queryset[:recipes_limit]
         return RecipesBriefSerializer(queryset, many=True).data
-
-    def get_recipes_count(self, obj) -> int:
-        return obj.recipes.all().count()
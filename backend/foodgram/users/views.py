@@ -1,3 +1,7 @@
+from django.db.models import (F, Prefetch, Value, Window,
+                              prefetch_related_objects)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import status
@@ -5,14 +9,45 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from api.paginations import CustomPagination
+from api.mixins import AsyncReadMixin
+from api.paginations import CustomPagination, FeedPagination
+from recipes.models import Recipe
 from users.models import Follow, User
 from users.serializers import FollowSerializer, ResponeSubscribeSerializer
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(AsyncReadMixin, UserViewSet):
     pagination_class = CustomPagination
 
+    @staticmethod
+    def get_subscriptions(user):
+        return User.objects.filter(following__user=user).annotate(
+            is_subscribed=Value(True)).order_by('username')
+
+    @staticmethod
+    def get_recipes_prefetch(authors, recipes_limit):
+        """
+        Подгружает рецепты авторов одним запросом, оставляя не больше
+        recipes_limit последних рецептов каждого автора.
+
+        """
+        queryset = Recipe.objects.all()
+        if recipes_limit is not None:
+            ranked = Recipe.objects.filter(author__in=authors).annotate(
+                recipe_rank=Window(
+                    expression=RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=F('id').desc(),
+                )
+            ).order_by().values('id', 'recipe_rank')
+            sql, params = ranked.query.sql_with_params()
+            queryset = queryset.filter(id__in=RawSQL(
+                f'SELECT id FROM ({sql}) AS ranked WHERE recipe_rank <= %s',
+                (*params, recipes_limit)
+            ))
+        return Prefetch(
+            'recipes', queryset=queryset, to_attr='limited_recipes')
+
     @action(
         detail=True,
         methods=('POST', 'DELETE'),
@@ -47,11 +82,15 @@ class CustomUserViewSet(UserViewSet):
         url_path='subscriptions',
         url_name='subscriptions',
         permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination,
     )
     def subscriptions(self, request):
-        user = request.user
-        queryset = User.objects.filter(following__user=user)
-        pages = self.paginate_queryset(queryset)
+        pages = self.paginate_queryset(self.get_subscriptions(request.user))
+        prefetch_related_objects(
+            pages,
+            self.get_recipes_prefetch(
+                pages, ResponeSubscribeSerializer.get_recipes_limit(request))
+        )
         serializer = ResponeSubscribeSerializer(
             pages,
             many=True,